@@ -1,10 +1,33 @@
 from flask import Flask, render_template, request, jsonify, send_file
-from PIL import Image, ImageDraw, ImageFont
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 from io import BytesIO
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+import atexit
+import hashlib
+import hmac
+import json
+import mimetypes
+import numpy as np
 import os
 import tempfile
+import threading
 import time
+import tracemalloc
+import uuid
 from datetime import datetime
+from incremental_png import IncrementalPNGEncoder
+from popularity import PopularRequests
+from render_log import RenderLog
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak_rss() then reports None
+    resource = None
 
 app = Flask(__name__)
 
@@ -16,27 +39,101 @@ DEFAULT_SIGN_TEXT = "WELCOME TO OREGON\nMAKE THIS SIGN SAY ANYTHING\nTHERE ARE F
 # Spacing between text lines in pixels
 LINE_SPACING_EXTRA = 14
 TEXT_TOP_PCT = 0.32
+TEXT_BOTTOM_PCT = 0.72
 START_Y_OFFSET = 200
 
+# Text effects, drawn beneath the text in this order (bottom to top)
+TEXT_EFFECTS = ('glow', 'shadow', 'outline')
+OUTLINE_WIDTH = 4
+OUTLINE_COLOR = '#ffffff'
+SHADOW_OFFSET = 6
+SHADOW_BLUR = 4
+SHADOW_COLOR = '#000000'
+SHADOW_OPACITY = 0.6
+GLOW_RADIUS = 12
+GLOW_COLOR = '#ffffff'
+GLOW_OPACITY = 0.8
+
+# Widths of the smaller copies saved alongside each full-size render
+OUTPUT_WIDTHS = (400, 800)
+
+# Reuse pre-compressed background rows when encoding PNGs (set to 0 to use Pillow)
+INCREMENTAL_PNG = os.environ.get('INCREMENTAL_PNG', '1') != '0'
+
+# Memory admitted to in-flight renders; further renders wait in a queue
+RENDER_MEMORY_BUDGET = int(os.environ.get('RENDER_MEMORY_BUDGET_MB', 512)) * 1024 * 1024
+# Fixed encoder working memory (zlib state, filter rows) per output format
+ENCODER_OVERHEAD = {'PNG': 1024 * 1024}
+# Share of the image height the text band and its float buffers may cover
+EFFECT_BAND_FRACTION = 0.5
+# Set to trace Python allocations per render stage (slows rendering)
+TRACE_ALLOCATIONS = os.environ.get('RENDER_TRACEMALLOC') == '1'
+# Reuse saved files for repeated requests (set to 0 to render every request)
+RENDER_CACHE = os.environ.get('RENDER_CACHE', '1') != '0'
+# Bump when a change to the rendering code should invalidate cached renders
+RENDER_VERSION = 1
+# Request frequency record used to pre-render popular signs
+POPULAR_REQUESTS_PATH = os.environ.get('POPULAR_REQUESTS_PATH', 'popular_requests.json')
+# Warm-up renders the top N requests, within a wall-clock budget and CPU share
+WARMUP_TOP_N = int(os.environ.get('WARMUP_TOP_N', 50))
+WARMUP_TIME_BUDGET = float(os.environ.get('WARMUP_TIME_BUDGET', 120))
+WARMUP_CPU_SHARE = float(os.environ.get('WARMUP_CPU_SHARE', 0.25))
+# Seconds between warm-up passes; 0 runs a single pass at startup
+WARMUP_INTERVAL = float(os.environ.get('WARMUP_INTERVAL', 0))
+# WSGI servers never call start_warmup(), so set this to warm up each worker,
+# e.g. `WARMUP_ON_IMPORT=1 gunicorn -w 4 app:app`. Warm-up starts with the first
+# request a worker serves rather than at import, so it also works with --preload
+# and never starts in asgi.py's or bulk_render.py's render worker processes
+WARMUP_ON_IMPORT = os.environ.get('WARMUP_ON_IMPORT') == '1'
+
+# Structured per-render log, written by a background thread
+RENDER_LOG_PATH = os.environ.get('RENDER_LOG_PATH', 'logs/render.jsonl')
+RENDER_LOG_SAMPLE = float(os.environ.get('RENDER_LOG_SAMPLE', 1.0))
+RENDER_LOG_QUEUE = int(os.environ.get('RENDER_LOG_QUEUE', 10000))
+RENDER_LOG_MAX_BYTES = int(os.environ.get('RENDER_LOG_MAX_MB', 10)) * 1024 * 1024
+RENDER_LOG_BACKUPS = int(os.environ.get('RENDER_LOG_BACKUPS', 5))
+
+# Fingerprinted, precompressed static files written by build_assets.py
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_MANIFEST_PATH = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Required as X-Admin-Token for admin endpoints; without it they are disabled
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Let loopback clients in without a token. Only safe when no proxy runs on this host,
+# since everything a local reverse proxy forwards arrives from 127.0.0.1
+ADMIN_ALLOW_LOOPBACK = os.environ.get('ADMIN_ALLOW_LOOPBACK', '0') == '1'
+
 # Cache for billboard image
 billboard_image_cache = None
+billboard_image_lock = threading.Lock()
 
-def get_billboard_image():
-    """Load and cache the billboard image"""
+def get_billboard_template():
+    """Load and cache the billboard image, returning the shared original"""
     global billboard_image_cache
 
     if billboard_image_cache is None:
-        try:
-            billboard_image_cache = Image.open(BILLBOARD_IMAGE_PATH)
-        except Exception as e:
-            print(f"Error loading billboard image: {e}")
-            # Create a fallback blue background
-            billboard_image_cache = Image.new('RGB', (800, 533), color='#1e3a8a')
+        with billboard_image_lock:
+            if billboard_image_cache is None:
+                try:
+                    image = Image.open(BILLBOARD_IMAGE_PATH)
+                    # Decode before publishing so other threads never see a half-loaded image
+                    image.load()
+                except Exception as e:
+                    print(f"Error loading billboard image: {e}")
+                    # Create a fallback blue background
+                    image = Image.new('RGB', (800, 533), color='#1e3a8a')
+                billboard_image_cache = image
 
-    return billboard_image_cache.copy()
+    return billboard_image_cache
 
+def get_billboard_image():
+    """Return a private copy of the billboard image to draw on"""
+    return get_billboard_template().copy()
+
+@lru_cache(maxsize=64)
 def get_font(size):
-    """Get the font for text rendering"""
+    """Get the font for text rendering (cached per size)"""
     try:
         # Try to use Impact font
         font = ImageFont.truetype("Impact", size)
@@ -86,8 +183,233 @@ def wrap_text(text, font, max_width, draw):
 
     return all_lines
 
-def generate_billboard(message, font_size=80, text_color='#000000'):
-    """Generate billboard image with custom text"""
+def compute_layouts(size, font_sizes, line_counts):
+    """Vectorized line placement for many (font size, line count) pairs.
+
+    Returns (left_margin, start_y, line_height): line i of entry k is drawn
+    at (left_margin, start_y[k] + i * line_height[k]).
+    """
+    width, height = size
+    font_sizes = np.asarray(font_sizes, dtype=np.float64)
+    line_counts = np.asarray(line_counts, dtype=np.float64)
+
+    # Define the billboard's horizontal line positions
+    # These values are approximate and based on the image dimensions (1784 x 1166)
+    billboard_top = height * TEXT_TOP_PCT    # Top of the text area
+    billboard_bottom = height * TEXT_BOTTOM_PCT  # Bottom of the text area
+
+    # Calculate available space and position text between the horizontal lines
+    available_height = billboard_bottom - billboard_top
+    # Increase line spacing using the extra spacing constant
+    line_height = np.minimum(font_sizes * 1.2 + LINE_SPACING_EXTRA,
+                             available_height / np.maximum(line_counts, 1))
+    total_height = line_counts * line_height
+
+    # Start from the billboard's top position, or center if there's extra space
+    start_y = np.where(total_height < available_height,
+                       billboard_top + (available_height - total_height) / 2,
+                       billboard_top)
+
+    # Move text up by 200 pixels
+    start_y = start_y - START_Y_OFFSET
+
+    # Use a consistent left margin (20% from the left edge of the image)
+    # Move text to the right by 100 pixels
+    left_margin = (width * 0.28) + 100
+    return left_margin, start_y, line_height
+
+class LayoutPlan:
+    """Precomputed line placement for one template size, font size and line count"""
+    __slots__ = ('size', 'font_size', 'line_count', 'left_margin', 'start_y',
+                 'line_height', 'positions')
+
+    def __init__(self, size, font_size, line_count):
+        left_margin, start_y, line_height = compute_layouts(size, [font_size], [line_count])
+        self.size = size
+        self.font_size = font_size
+        self.line_count = line_count
+        self.left_margin = left_margin
+        self.start_y = float(start_y[0])
+        self.line_height = float(line_height[0])
+        self.positions = tuple((left_margin, self.start_y + (i * self.line_height))
+                               for i in range(line_count))
+
+    def __repr__(self):
+        return (f'LayoutPlan(size={self.size}, font_size={self.font_size}, '
+                f'line_count={self.line_count}, start_y={self.start_y:.1f}, '
+                f'line_height={self.line_height:.1f})')
+
+@lru_cache(maxsize=4096)
+def get_layout_plan(size, font_size, line_count):
+    """Cached LayoutPlan, so placement is a table lookup after the first render"""
+    return LayoutPlan(size, font_size, line_count)
+
+def layout_batch(messages, font_sizes=80, size=None):
+    """Wrap and place many messages at once.
+
+    font_sizes may be one size for all messages or one per message. Returns
+    a list of (lines, positions) with positions as an (n, 2) float array.
+    """
+    size = size or get_billboard_template().size
+    if np.isscalar(font_sizes):
+        font_sizes = [font_sizes] * len(messages)
+    if not len(messages):
+        return []
+
+    # Text measurement does not depend on the image, so one tiny canvas will do
+    draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+    max_text_width = int(size[0] * 0.7)
+    wrapped = [wrap_text(message.upper(), get_font(font_size), max_text_width, draw)
+               for message, font_size in zip(messages, font_sizes)]
+
+    line_counts = np.fromiter((len(lines) for lines in wrapped), dtype=np.int64, count=len(wrapped))
+    left_margin, start_y, line_height = compute_layouts(size, font_sizes, line_counts)
+
+    # One flat array of every line's y, split back per message
+    offsets = np.arange(line_counts.sum()) - np.repeat(np.cumsum(line_counts) - line_counts, line_counts)
+    ys = np.repeat(start_y, line_counts) + offsets * np.repeat(line_height, line_counts)
+    positions = np.column_stack([np.full(len(ys), left_margin), ys])
+    return list(zip(wrapped, np.split(positions, np.cumsum(line_counts)[:-1])))
+
+def normalize_request(data):
+    """Turn a {message, fontSize, textColor, effects} dict into render arguments"""
+    message = data.get('message', DEFAULT_SIGN_TEXT)
+    font_size = int(data.get('fontSize', 80))
+    text_color = data.get('textColor', '#000000')
+    effects = parse_effects(data.get('effects'))
+
+    # Fall back to black for missing, non-string or unknown colors
+    try:
+        ImageColor.getrgb(text_color)
+    except (AttributeError, TypeError, ValueError):
+        text_color = '#000000'
+
+    if message is None:
+        message = DEFAULT_SIGN_TEXT
+
+    # Limit message length
+    message = str(message)[:MAX_MESSAGE_LENGTH]
+
+    return message, font_size, text_color, effects
+
+def parse_effects(effects):
+    """Validate a list of effect names and return them in drawing order"""
+    if not effects:
+        return ()
+    if isinstance(effects, str):
+        effects = [effects]
+    unknown = set(effects) - set(TEXT_EFFECTS)
+    if unknown:
+        raise ValueError(f"Unknown text effect(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in TEXT_EFFECTS if name in effects)
+
+def effect_margin(effects):
+    """Pixels the selected effects can extend beyond the glyphs"""
+    margin = 0
+    if 'outline' in effects:
+        margin = max(margin, OUTLINE_WIDTH)
+    if 'shadow' in effects:
+        margin = max(margin, SHADOW_OFFSET + 3 * SHADOW_BLUR)
+    if 'glow' in effects:
+        margin = max(margin, 4 * GLOW_RADIUS)
+    return margin
+
+def dilate_mask(mask, radius):
+    """Grow a float mask by radius pixels using separable max filters"""
+    out = mask.copy()
+    for k in range(1, radius + 1):
+        np.maximum(out[:, k:], mask[:, :-k], out=out[:, k:])
+        np.maximum(out[:, :-k], mask[:, k:], out=out[:, :-k])
+    rows = out.copy()
+    for k in range(1, radius + 1):
+        np.maximum(out[k:], rows[:-k], out=out[k:])
+        np.maximum(out[:-k], rows[k:], out=out[:-k])
+    return out
+
+def _box_blur_rows(a, radius):
+    """Box blur along axis 0 using a running sum"""
+    padded = np.pad(a, ((radius + 1, radius), (0, 0)))
+    summed = np.cumsum(padded, axis=0)
+    return (summed[2 * radius + 1:] - summed[:-(2 * radius + 1)]) / (2 * radius + 1)
+
+def blur_mask(mask, radius):
+    """Approximate a Gaussian blur with three box blur passes"""
+    if radius <= 0:
+        return mask
+    box = max(1, radius // 2)
+    out = mask
+    for _ in range(3):
+        out = _box_blur_rows(out, box)
+        out = _box_blur_rows(out.T, box).T
+    return out
+
+def shift_mask(mask, dx, dy):
+    """Offset a mask by (dx, dy) pixels, filling uncovered edges with zero"""
+    out = np.zeros_like(mask)
+    h, w = mask.shape
+    out[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] = \
+        mask[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+    return out
+
+def composite_color(pixels, alpha, color):
+    """Blend a solid color into a float pixel array using alpha (0..1)"""
+    rgb = np.array(ImageColor.getrgb(color)[:3], dtype=np.float32)
+    a = alpha[..., None]
+    pixels[..., :3] += (rgb - pixels[..., :3]) * a
+    if pixels.shape[2] == 4:
+        pixels[..., 3] += (255 - pixels[..., 3]) * alpha
+
+def draw_text_effects(img, lines, positions, font, text_color, effects):
+    """Draw text plus effects, working only on the crop around the text"""
+    boxes = []
+    for line, (x, y) in zip(lines, positions):
+        if line:
+            left, top, right, bottom = font.getbbox(line)
+            boxes.append((x + left, y + top, x + right, y + bottom))
+    if not boxes:
+        return img
+
+    # Text band: union of line boxes plus room for the effects
+    margin = effect_margin(effects)
+    width, height = img.size
+    band = (max(int(min(b[0] for b in boxes)) - margin, 0),
+            max(int(min(b[1] for b in boxes)) - margin, 0),
+            min(int(max(b[2] for b in boxes)) + margin + 1, width),
+            min(int(max(b[3] for b in boxes)) + margin + 1, height))
+    if band[0] >= band[2] or band[1] >= band[3]:
+        return img
+
+    # Rasterize every line into a single mask once
+    mask_img = Image.new('L', (band[2] - band[0], band[3] - band[1]), 0)
+    mask_draw = ImageDraw.Draw(mask_img)
+    for line, (x, y) in zip(lines, positions):
+        mask_draw.text((x - band[0], y - band[1]), line, font=font, fill=255)
+    mask = np.asarray(mask_img, dtype=np.float32) / 255.0
+
+    crop = img.crop(band)
+    pixels = np.asarray(crop, dtype=np.float32).copy()
+
+    if 'glow' in effects:
+        glow = blur_mask(dilate_mask(mask, GLOW_RADIUS // 2), GLOW_RADIUS)
+        composite_color(pixels, np.clip(glow * GLOW_OPACITY, 0, 1), GLOW_COLOR)
+    if 'shadow' in effects:
+        shadow = blur_mask(shift_mask(mask, SHADOW_OFFSET, SHADOW_OFFSET), SHADOW_BLUR)
+        composite_color(pixels, shadow * SHADOW_OPACITY, SHADOW_COLOR)
+    if 'outline' in effects:
+        composite_color(pixels, dilate_mask(mask, OUTLINE_WIDTH), OUTLINE_COLOR)
+    composite_color(pixels, mask, text_color)
+
+    result = np.clip(pixels + 0.5, 0, 255).astype(np.uint8)
+    img.paste(Image.fromarray(result), band[:2])
+    return img
+
+def generate_billboard(message, font_size=80, text_color='#000000', effects=(), stats=None,
+                       layout=None):
+    """Generate billboard image with custom text.
+
+    If a stats dict is given, the wrapped line count is stored in it. A
+    (lines, positions) layout from layout_batch() skips wrapping and placement.
+    """
     # Get base image
     img = get_billboard_image()
     width, height = img.size
@@ -100,44 +422,555 @@ def generate_billboard(message, font_size=80, text_color='#000000'):
 
     # Convert text to uppercase
     message = message.upper()
+    effects = parse_effects(effects)
 
-    # Calculate text area (70% of image width)
-    max_text_width = int(width * 0.7)
+    if layout is None:
+        # Calculate text area (70% of image width)
+        max_text_width = int(width * 0.7)
 
-    # Wrap text
-    lines = wrap_text(message, font, max_text_width, draw)
+        # Wrap text
+        lines = wrap_text(message, font, max_text_width, draw)
 
-    # Define the billboard's horizontal line positions
-    # These values are approximate and based on the image dimensions (1784 x 1166)
-    billboard_top = height * TEXT_TOP_PCT    # Top of the text area
-    billboard_bottom = height * 0.72  # Bottom of the text area
+        # Look up where each line goes
+        positions = get_layout_plan(img.size, font_size, len(lines)).positions
+    else:
+        lines, positions = layout
+    if stats is not None:
+        stats['line_count'] = len(lines)
 
-    # Calculate available space and position text between the horizontal lines
-    available_height = billboard_bottom - billboard_top
-    # Increase line spacing using the extra spacing constant
-    line_height = min(font_size * 1.2 + LINE_SPACING_EXTRA, available_height / max(len(lines), 1))
-    total_height = len(lines) * line_height
+    if effects:
+        draw_text_effects(img, lines, positions, font, text_color, effects)
+        return img
 
-    # Start from the billboard's top position, or center if there's extra space
-    start_y = billboard_top
-    if total_height < available_height:
-        start_y = billboard_top + (available_height - total_height) / 2
+    # Draw text (left-justified)
+    for line, (x, y) in zip(lines, positions):
+        draw.text((x, y), line, font=font, fill=text_color)
 
-    # Move text up by 200 pixels
-    start_y -= START_Y_OFFSET
+    return img
 
-    # Draw text
-    for i, line in enumerate(lines):
-        # Use a consistent left margin (20% from the left edge of the image)
-        # Move text to the right by 100 pixels
-        left_margin = (width * 0.28) + 100
-        x = left_margin
-        y = start_y + (i * line_height)
+def build_pyramid(img, widths=OUTPUT_WIDTHS):
+    """Downscale a render to each target width, largest first.
 
-        # Draw text (left-justified)
-        draw.text((x, y), line, font=font, fill=text_color)
+    Each size is produced from the previous one by halving with
+    Image.reduce, followed by a small resize to land on the exact width.
+    Widths at or above the full image width are skipped.
+    """
+    variants = []
+    current = img
+    for target in sorted(widths, reverse=True):
+        if target >= img.width:
+            continue
+        while current.width // 2 >= target:
+            current = current.reduce(2)
+        if current.width == target:
+            variants.append((target, current))
+        else:
+            target_height = max(1, round(current.height * target / current.width))
+            variants.append((target, current.resize((target, target_height), Image.LANCZOS)))
+    return variants
 
-    return img
+def save_pyramid(img, basename, directory=TEMP_DIR):
+    """Save the full render and its downscaled copies as PNG.
+
+    Returns a list of (width, filename) pairs, smallest first.
+    """
+    saved = []
+    for width, variant in build_pyramid(img):
+        filename = f'{basename}_{width}w.png'
+        save_png(variant, os.path.join(directory, filename))
+        saved.append((width, filename))
+    filename = f'{basename}.png'
+    save_png(img, os.path.join(directory, filename))
+    saved.append((img.width, filename))
+    return sorted(saved)
+
+# Incremental PNG encoders for the template and each pyramid size, keyed by size
+png_encoders = None
+png_encoders_lock = threading.Lock()
+
+def get_png_encoders():
+    """Build (once) the incremental encoders for the template and its pyramid"""
+    global png_encoders
+
+    with png_encoders_lock:
+        if png_encoders is None:
+            encoders = {}
+            template = get_billboard_template()
+            for _, variant in [(template.width, template)] + build_pyramid(template):
+                try:
+                    encoders[variant.size] = IncrementalPNGEncoder(variant)
+                except ValueError as e:
+                    print(f"Incremental PNG disabled for {variant.size}: {e}")
+            png_encoders = encoders
+    return png_encoders
+
+def encode_png(img):
+    """Encode an image as PNG bytes, reusing the background's compressed rows"""
+    if INCREMENTAL_PNG:
+        encoder = get_png_encoders().get(img.size)
+        if encoder is not None and encoder.accepts(img):
+            return encoder.encode(img)
+    buffer = BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def warm_caches():
+    """Load the background and build the PNG encoders ahead of the first render"""
+    get_billboard_template()
+    if INCREMENTAL_PNG:
+        get_png_encoders()
+
+def save_png(img, path):
+    """Save an image as PNG via encode_png(), replacing any existing file atomically"""
+    tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_png(img))
+    os.replace(tmp_path, path)
+
+def estimate_render_bytes(size, mode, effects=(), fmt='PNG'):
+    """Estimate the peak memory one render needs for a template.
+
+    Counts the working copy of the background, the downscaled copies, the
+    float32 mask and pixel buffers used by text effects, and the encoder.
+    """
+    width, height = size
+    bands = Image.getmodebands(mode)
+    frame = width * height * bands
+    # Working copy plus the pyramid (1/4 + 1/16 + resize scratch)
+    total = frame + frame // 3
+    if effects:
+        band_pixels = int(width * height * EFFECT_BAND_FRACTION)
+        # float32 pixels, mask and two scratch masks per effect
+        total += band_pixels * 4 * (bands + 1 + 2 * len(effects))
+    return total + ENCODER_OVERHEAD.get(fmt, ENCODER_OVERHEAD['PNG'])
+
+def request_render_bytes(effects=()):
+    """Estimate the peak memory of one render of the billboard template"""
+    template = get_billboard_template()
+    return estimate_render_bytes(template.size, template.mode, effects)
+
+def current_rss():
+    """Resident set size of this process in bytes, if known"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, if known"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+class MemoryGovernor:
+    """Admit renders only while their estimated memory fits the budget.
+
+    Renders that do not fit wait in FIFO order. A render larger than the
+    whole budget is still admitted once nothing else is in flight, so it
+    cannot wait forever.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.reserved_bytes = 0
+        self.peak_reserved_bytes = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self._waiting = deque()
+        self._lock = threading.Condition()
+
+    def _fits(self, nbytes):
+        return self.in_flight == 0 or self.reserved_bytes + nbytes <= self.budget_bytes
+
+    def acquire(self, nbytes):
+        """Block until nbytes can be reserved"""
+        ticket = object()
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting.append(ticket)
+            while self._waiting[0] is not ticket or not self._fits(nbytes):
+                self._lock.wait()
+            self._waiting.popleft()
+            self.reserved_bytes += nbytes
+            self.peak_reserved_bytes = max(self.peak_reserved_bytes, self.reserved_bytes)
+            self.in_flight += 1
+            self.admitted += 1
+            self.total_wait += time.perf_counter() - start
+            # The next waiter may fit as well
+            self._lock.notify_all()
+
+    def release(self, nbytes):
+        """Return nbytes reserved by acquire()"""
+        with self._lock:
+            self.reserved_bytes -= nbytes
+            self.in_flight -= 1
+            self._lock.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes):
+        """Block until nbytes can be reserved, and release them afterwards"""
+        self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'reserved_bytes': self.reserved_bytes,
+                'peak_reserved_bytes': self.peak_reserved_bytes,
+                'in_flight': self.in_flight,
+                'queued': len(self._waiting),
+                'admitted': self.admitted,
+                'mean_wait_ms': round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            }
+
+render_governor = MemoryGovernor(RENDER_MEMORY_BUDGET)
+
+if TRACE_ALLOCATIONS:
+    tracemalloc.start()
+
+# Per-stage Python allocation deltas, filled in while tracemalloc is tracing
+stage_allocations = {}
+stage_allocations_lock = threading.Lock()
+
+@contextmanager
+def track_allocations(stage):
+    """Record the traced allocation delta of a render stage.
+
+    tracemalloc sees numpy buffers but not Pillow's pixel memory, and with
+    concurrent renders the deltas include other threads' allocations.
+    """
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        delta = tracemalloc.get_traced_memory()[0] - before
+        with stage_allocations_lock:
+            entry = stage_allocations.setdefault(stage, {'count': 0, 'last_bytes': 0, 'max_bytes': 0})
+            entry['count'] += 1
+            entry['last_bytes'] = delta
+            entry['max_bytes'] = max(entry['max_bytes'], delta)
+
+@contextmanager
+def render_stage(stage, timings):
+    """Time a render stage in milliseconds and track its allocations"""
+    start = time.perf_counter()
+    try:
+        with track_allocations(stage):
+            yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 3)
+
+def memory_report(top=0):
+    """Governor, RSS and tracemalloc figures for the admin endpoint"""
+    report = {
+        'governor': render_governor.stats(),
+        'rss_bytes': current_rss(),
+        'peak_rss_bytes': peak_rss(),
+        'tracemalloc': {'tracing': tracemalloc.is_tracing()},
+    }
+    if tracemalloc.is_tracing():
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        with stage_allocations_lock:
+            stages = {stage: dict(entry) for stage, entry in stage_allocations.items()}
+        report['tracemalloc'].update({'traced_bytes': traced, 'peak_traced_bytes': traced_peak,
+                                      'stages': stages})
+        if top:
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:top]
+            report['tracemalloc']['top'] = [
+                {'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                for stat in statistics
+            ]
+    return report
+
+def admin_allowed(remote_addr, token):
+    """Admin endpoints need ADMIN_TOKEN, or a local client if explicitly allowed"""
+    if ADMIN_TOKEN and token:
+        return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+    return ADMIN_ALLOW_LOOPBACK and remote_addr in ('127.0.0.1', '::1')
+
+def request_key(message, font_size, text_color, effects):
+    """Canonical string for a normalized render request"""
+    return json.dumps([message.upper(), font_size, text_color.lower(), list(effects)])
+
+def request_hash(key):
+    """Short stable digest of a request key"""
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+@lru_cache(maxsize=None)
+def render_fingerprint():
+    """Digest of everything besides the request that changes what a render looks like"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(BILLBOARD_IMAGE_PATH, 'rb') as f:
+        digest.update(f.read())
+    font = getattr(get_font(80), 'path', None)
+    settings = [RENDER_VERSION, font if isinstance(font, str) else repr(type(font)),
+                LINE_SPACING_EXTRA, TEXT_TOP_PCT, TEXT_BOTTOM_PCT, START_Y_OFFSET,
+                TEXT_EFFECTS, OUTLINE_WIDTH, OUTLINE_COLOR, SHADOW_OFFSET, SHADOW_BLUR,
+                SHADOW_COLOR, SHADOW_OPACITY, GLOW_RADIUS, GLOW_COLOR, GLOW_OPACITY,
+                OUTPUT_WIDTHS]
+    digest.update(json.dumps(settings).encode())
+    return digest.hexdigest()
+
+def cache_basename(key):
+    """File name prefix for a request; identical requests share their files.
+
+    Includes render_fingerprint(), so a new template, font or rendering code
+    stops serving renders made before the change and lets them age out.
+    """
+    return f'billboard_{request_hash(render_fingerprint() + key)}'
+
+def cache_lookup(basename):
+    """Return the saved files for a cached render if they are all still on disk"""
+    template = get_billboard_template()
+    saved = [(width, f'{basename}_{width}w.png') for width in sorted(OUTPUT_WIDTHS)
+             if width < template.width]
+    saved.append((template.width, f'{basename}.png'))
+    try:
+        # Refresh the files so cleanup_old_files() keeps popular renders
+        for _, filename in saved:
+            os.utime(os.path.join(TEMP_DIR, filename))
+    except OSError:
+        return None
+    return saved
+
+popular_requests = PopularRequests(POPULAR_REQUESTS_PATH)
+popular_requests.load()
+atexit.register(popular_requests.save)
+
+def record_request(normalized):
+    """Count a request, as returned by normalize_request(), in the popularity record"""
+    message, font_size, text_color, effects = normalized
+    popular_requests.record(request_key(message, font_size, text_color, effects),
+                            {'message': message, 'fontSize': font_size,
+                             'textColor': text_color, 'effects': list(effects)})
+
+render_log = RenderLog(RENDER_LOG_PATH, RENDER_LOG_SAMPLE, RENDER_LOG_QUEUE,
+                       RENDER_LOG_MAX_BYTES, RENDER_LOG_BACKUPS)
+
+def render_request(data, record=True, warmup=False, reserve=True):
+    """Render a /generate request body, save the files and build the response"""
+    return render_normalized(normalize_request(data), record, warmup, reserve)
+
+def render_normalized(normalized, record=True, warmup=False, reserve=True):
+    """Render a request as returned by normalize_request().
+
+    Pass reserve=False when the caller already holds a render_governor
+    reservation for this request, e.g. in another process.
+    """
+    timings = {}
+    stats = {}
+    start = time.perf_counter()
+    if record:
+        record_request(normalized)
+    message, font_size, text_color, effects = normalized
+    key = request_key(message, font_size, text_color, effects)
+
+    with render_stage('cache', timings):
+        if RENDER_CACHE:
+            basename = cache_basename(key)
+            saved = cache_lookup(basename)
+        else:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            basename = f'billboard_{timestamp}_{uuid.uuid4().hex[:8]}'
+            saved = None
+
+    cached = saved is not None
+    if not cached:
+        queued = time.perf_counter()
+        with render_governor.reserve(request_render_bytes(effects)) if reserve else nullcontext():
+            timings['queue'] = round((time.perf_counter() - queued) * 1000, 3)
+
+            # Generate image
+            with render_stage('render', timings):
+                img = generate_billboard(message, font_size, text_color, effects, stats)
+
+            # Save full size and smaller copies to temporary files
+            with render_stage('save', timings):
+                saved = save_pyramid(img, basename)
+            del img
+    filename = saved[-1][1]
+
+    if render_log.should_sample():
+        timings['total'] = round((time.perf_counter() - start) * 1000, 3)
+        log_render(key, message, font_size, effects, saved, cached, stats, timings, warmup)
+
+    return {
+        'success': True,
+        'filename': filename,
+        'url': f'/image/{filename}',
+        'srcset': [{'width': width, 'url': f'/image/{name}'} for width, name in saved],
+        'cached': cached
+    }
+
+def log_render(key, message, font_size, effects, saved, cached, stats, timings, warmup):
+    """Queue a structured record of one render for the background log writer"""
+    output_bytes = 0
+    for _, name in saved:
+        try:
+            output_bytes += os.path.getsize(os.path.join(TEMP_DIR, name))
+        except OSError:
+            pass
+    render_log.log({
+        'ts': round(time.time(), 3),
+        'pid': os.getpid(),
+        'input_hash': request_hash(key),
+        'message_length': len(message),
+        # Cache hits skip layout, so their line count is unknown
+        'line_count': stats.get('line_count'),
+        'font_size': font_size,
+        'effects': list(effects),
+        'output_bytes': output_bytes,
+        'outputs': len(saved),
+        'cache': 'hit' if cached else ('miss' if RENDER_CACHE else 'off'),
+        'warmup': warmup,
+        'stages_ms': timings,
+    })
+
+def lower_thread_priority():
+    """Lower the calling thread's scheduling priority where the OS allows it"""
+    try:
+        # On Linux each thread has its own nice value
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+def warm_popular_renders(top_n=WARMUP_TOP_N, time_budget=WARMUP_TIME_BUDGET,
+                         cpu_share=WARMUP_CPU_SHARE):
+    """Pre-render the most popular requests into the render cache.
+
+    Pauses while real renders are in flight, and sleeps between renders so
+    warm-up uses at most cpu_share of one core. Stops at time_budget.
+    Returns the number of requests rendered.
+    """
+    if not RENDER_CACHE:
+        return 0
+    deadline = time.monotonic() + time_budget
+    cpu_share = min(max(cpu_share, 0.01), 1.0)
+    payloads = [{'message': DEFAULT_SIGN_TEXT}] + [payload for _, payload in popular_requests.top(top_n)]
+    rendered = 0
+    for payload in payloads[:max(top_n, 1)]:
+        while render_governor.stats()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if time.monotonic() >= deadline:
+            break
+        start = time.monotonic()
+        try:
+            if not render_request(payload, record=False, warmup=True)['cached']:
+                rendered += 1
+        except Exception as e:
+            print(f"Warm-up render failed: {e}")
+        elapsed = time.monotonic() - start
+        time.sleep(min(elapsed * (1 - cpu_share) / cpu_share, max(deadline - time.monotonic(), 0)))
+    return rendered
+
+warmup_thread = None
+warmup_pid = None
+
+def start_warmup():
+    """Warm caches in a low-priority background thread; never blocks startup.
+
+    Starts at most one warm-up thread per process.
+    """
+    global warmup_thread, warmup_pid
+
+    if warmup_pid == os.getpid():
+        return warmup_thread
+
+    def run():
+        lower_thread_priority()
+        warm_caches()
+        while True:
+            rendered = warm_popular_renders()
+            print(f"Warm-up pre-rendered {rendered} popular request(s)")
+            if WARMUP_INTERVAL <= 0:
+                break
+            time.sleep(WARMUP_INTERVAL)
+            popular_requests.save()
+
+    warmup_thread = threading.Thread(target=run, name='warmup', daemon=True)
+    warmup_thread.start()
+    warmup_pid = os.getpid()
+    return warmup_thread
+
+@app.before_request
+def start_worker_warmup():
+    """With WARMUP_ON_IMPORT, warm up from the first request each WSGI worker serves"""
+    if WARMUP_ON_IMPORT:
+        start_warmup()
+
+def load_asset_manifest():
+    """Load the static asset manifest, or an empty one if assets are not built"""
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Logical path -> manifest entry, and fingerprinted file -> manifest entry
+asset_manifest = load_asset_manifest()
+assets_by_file = {entry['file']: entry for entry in asset_manifest.values()}
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Point url_for('static', ...) at the fingerprinted copy when one is built"""
+    if endpoint == 'static' and values.get('filename') in asset_manifest:
+        values['filename'] = 'dist/' + asset_manifest[values['filename']]['file']
+
+def resolve_asset(filename, accept_encoding='', accept=''):
+    """Choose the file to send for a fingerprinted asset.
+
+    Returns (path, mimetype, headers), preferring WebP for images and a
+    precompressed encoding for text when the client accepts them, or None
+    if filename is not a built asset.
+    """
+    entry = assets_by_file.get(filename)
+    if entry is None:
+        return None
+
+    mimetype = mimetypes.guess_type(entry['file'])[0] or 'application/octet-stream'
+    served = entry['file']
+    headers = {'Cache-Control': ASSET_CACHE_CONTROL}
+
+    if entry.get('webp'):
+        headers['Vary'] = 'Accept'
+        # Only when named outright: browsers without WebP still send image/* and */*
+        if any(value.lower() == 'image/webp' and quality > 0
+               for value, quality in parse_accept_header(accept, MIMEAccept)):
+            served = entry['webp']
+            mimetype = 'image/webp'
+    elif entry['encodings']:
+        headers['Vary'] = 'Accept-Encoding'
+        accepted = parse_accept_header(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in entry['encodings'] and accepted[encoding]:
+                served = entry['encodings'][encoding]
+                headers['Content-Encoding'] = encoding
+                break
+
+    return os.path.join(ASSET_DIST_DIR, served), mimetype, headers
+
+@app.route('/static/dist/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted static asset with immutable caching"""
+    resolved = resolve_asset(filename, request.headers.get('Accept-Encoding', ''),
+                             request.headers.get('Accept', ''))
+    if resolved is None:
+        return jsonify({'error': 'File not found'}), 404
+    path, mimetype, headers = resolved
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+    response.headers.update(headers)
+    return response
 
 @app.route('/')
 def index():
@@ -148,29 +981,7 @@ def index():
 def generate():
     """Generate billboard image"""
     try:
-        data = request.json
-        message = data.get('message', DEFAULT_SIGN_TEXT)
-        font_size = int(data.get('fontSize', 80))
-        text_color = data.get('textColor', '#000000')
-        
-        # Limit message length
-        message = message[:MAX_MESSAGE_LENGTH]
-        
-        # Generate image
-        img = generate_billboard(message, font_size, text_color)
-        
-        # Save to temporary file
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'billboard_{timestamp}.png'
-        filepath = os.path.join(TEMP_DIR, filename)
-        
-        img.save(filepath, 'PNG')
-        
-        return jsonify({
-            'success': True,
-            'filename': filename,
-            'url': f'/image/{filename}'
-        })
+        return jsonify(render_request(request.json))
     
     except Exception as e:
         return jsonify({
@@ -178,6 +989,21 @@ def generate():
             'error': str(e)
         }), 500
 
+@app.route('/admin/memory')
+def admin_memory():
+    """Report render memory reservations, RSS and allocation snapshots"""
+    if not admin_allowed(request.remote_addr, request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    top = request.args.get('top', 0, type=int)
+    return jsonify(memory_report(top))
+
+@app.route('/admin/render-log')
+def admin_render_log():
+    """Report render log sampling, write and drop counters"""
+    if not admin_allowed(request.remote_addr, request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(render_log.stats())
+
 @app.route('/image/<filename>')
 def serve_image(filename):
     """Serve generated image"""
@@ -197,11 +1023,15 @@ def cleanup_old_files():
     for filename in os.listdir(TEMP_DIR):
         if filename.startswith('billboard_'):
             filepath = os.path.join(TEMP_DIR, filename)
-            if current_time - os.path.getmtime(filepath) > 3600:  # 1 hour
-                try:
+            try:
+                # Files may be renamed or removed by concurrent requests meanwhile
+                if current_time - os.path.getmtime(filepath) > 3600:  # 1 hour
                     os.remove(filepath)
-                except:
-                    pass
+            except OSError:
+                pass
 
 if __name__ == '__main__':
+    # The debug reloader runs this block twice; only warm up in the serving process
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     app.run(debug=True, host='0.0.0.0', port=8080)
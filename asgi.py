@@ -0,0 +1,371 @@
+"""
+Uncle Sam Billboard Generator - ASGI entry point
+
+Serves the same routes as app.py (/, /generate, /image/<filename> and
+/static/...) from an asyncio event loop. Rendering and encoding run in an
+executor, and files are streamed in chunks, so slow downloads only hold an
+idle coroutine instead of a worker.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+
+Environment variables:
+    ASGI_EXECUTOR  'thread' (default) or 'process' for renders
+    ASGI_WORKERS   Number of render workers (default: CPU count)
+"""
+
+import asyncio
+import json
+import mimetypes
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from urllib.parse import parse_qs
+
+from flask import render_template
+from werkzeug.security import safe_join
+
+import app as billboard
+
+EXECUTOR_KIND = os.environ.get('ASGI_EXECUTOR', 'thread')
+RENDER_WORKERS = int(os.environ.get('ASGI_WORKERS', os.cpu_count() or 1))
+# Size of each chunk read from disk and sent to the client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+render_executor = None
+index_html = None
+# Admits process-executor renders against the memory budget one at a time, in order
+admission_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='admission')
+
+
+def make_executor():
+    """Create the executor that renders and encodes images"""
+    if EXECUTOR_KIND == 'process':
+        # Forking would copy locks held by the warm-up thread into the workers and
+        # deadlock them, so start workers from a clean forkserver process instead
+        return ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                   mp_context=multiprocessing.get_context('forkserver'),
+                                   initializer=billboard.warm_caches)
+    if EXECUTOR_KIND == 'thread':
+        return ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='render')
+    raise ValueError(f"ASGI_EXECUTOR must be 'thread' or 'process', not {EXECUTOR_KIND!r}")
+
+
+def render_index():
+    """Render the main page once through Flask so url_for works as usual"""
+    with billboard.app.test_request_context('/'):
+        return render_template('index.html').encode('utf-8')
+
+
+async def read_body(receive):
+    """Collect the full request body"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    """Send a complete response in one message"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, payload):
+    await send_response(send, status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+
+def parse_range(value, size):
+    """(start, end) for a single 'bytes=' range, or None to send the whole file
+
+    Raises ValueError when the range lies entirely past the end of the file.
+    """
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        first = int(first) if first else None
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if first is None:
+        if last is None:
+            return None
+        # 'bytes=-N' is the last N bytes; there are no last 0 bytes to send
+        if last == 0 or size == 0:
+            raise ValueError(value)
+        return max(size - last, 0), size - 1
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError(value)
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def not_modified(request_headers, etag, mtime):
+    """Whether the client's cached copy is still current"""
+    if_none_match = request_headers.get(b'if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.decode('latin-1').split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = request_headers.get(b'if-modified-since')
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since.decode('latin-1')).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+async def send_file(scope, send, path, content_type, headers=()):
+    """Stream a file from disk in chunks, reading off the event loop
+
+    Answers conditional requests with 304 and a single byte range with 206.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        f = await loop.run_in_executor(None, open, path, 'rb')
+    except OSError:
+        await send_json(send, 404, {'error': 'File not found'})
+        return
+
+    try:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+        validators = [(b'etag', etag.encode()),
+                      (b'last-modified', formatdate(st.st_mtime, usegmt=True).encode()),
+                      *headers]
+        request_headers = dict(scope.get('headers') or [])
+
+        if not_modified(request_headers, etag, st.st_mtime):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': validators})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        status, start, end = 200, 0, size - 1
+        range_header = request_headers.get(b'range')
+        if_range = request_headers.get(b'if-range')
+        if range_header is not None and (if_range is None or if_range.decode('latin-1') == etag):
+            try:
+                byte_range = parse_range(range_header.decode('latin-1'), size)
+            except ValueError:
+                await send({
+                    'type': 'http.response.start',
+                    'status': 416,
+                    'headers': [(b'content-range', f'bytes */{size}'.encode()),
+                                (b'content-length', b'0')],
+                })
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+                validators.append((b'content-range', f'bytes {start}-{end}/{size}'.encode()))
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type.encode()),
+                        (b'content-length', str(end - start + 1).encode()),
+                        (b'accept-ranges', b'bytes'),
+                        *validators],
+        })
+        if start:
+            await loop.run_in_executor(None, f.seek, start)
+        remaining = end - start + 1
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, min(STREAM_CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            more_body = bool(chunk) and remaining > 0
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+            if not more_body:
+                break
+    finally:
+        f.close()
+
+
+def admit(effects):
+    """Reserve render memory in this process and return the number of bytes reserved"""
+    nbytes = billboard.request_render_bytes(effects)
+    billboard.render_governor.acquire(nbytes)
+    return nbytes
+
+
+async def render_in_process(normalized):
+    """Render in a worker process while holding this process's memory reservation
+
+    Each worker process has its own render_governor, so the budget is only
+    shared when the reservation is made here.
+    """
+    loop = asyncio.get_running_loop()
+    nbytes = await loop.run_in_executor(admission_executor, admit, normalized[3])
+    try:
+        return await loop.run_in_executor(
+            render_executor, partial(billboard.render_normalized, normalized, record=False, reserve=False))
+    finally:
+        billboard.render_governor.release(nbytes)
+
+
+async def handle_generate(receive, send):
+    """POST /generate"""
+    try:
+        normalized = billboard.normalize_request(json.loads(await read_body(receive)))
+        loop = asyncio.get_running_loop()
+        # Count popularity here so a process executor still shares one record
+        await loop.run_in_executor(None, billboard.record_request, normalized)
+        if EXECUTOR_KIND == 'process':
+            result = await render_in_process(normalized)
+        else:
+            result = await loop.run_in_executor(render_executor, billboard.render_normalized,
+                                                normalized, False)
+        await send_json(send, 200, result)
+    except Exception as e:
+        await send_json(send, 500, {'success': False, 'error': str(e)})
+
+
+async def handle_image(scope, send, filename):
+    """GET /image/<filename>"""
+    filepath = safe_join(billboard.TEMP_DIR, filename)
+    if filepath is None or '/' in filename or not os.path.exists(filepath):
+        await send_json(send, 404, {'error': 'File not found'})
+        return
+
+    # Clean up old files (older than 1 hour) without holding up the download
+    asyncio.get_running_loop().run_in_executor(None, billboard.cleanup_old_files)
+
+    disposition = f'attachment; filename="{filename}"'.encode('latin-1', 'replace')
+    await send_file(scope, send, filepath, 'image/png', [(b'content-disposition', disposition)])
+
+
+async def handle_static(scope, send, path):
+    """GET /static/<path>"""
+    if path.startswith('dist/'):
+        headers = dict(scope.get('headers') or [])
+        resolved = billboard.resolve_asset(path[len('dist/'):],
+                                           headers.get(b'accept-encoding', b'').decode('latin-1'),
+                                           headers.get(b'accept', b'').decode('latin-1'))
+        if resolved is None:
+            await send_json(send, 404, {'error': 'File not found'})
+            return
+        filepath, content_type, extra = resolved
+        await send_file(scope, send, filepath, content_type,
+                        [(name.lower().encode(), value.encode()) for name, value in extra.items()])
+        return
+
+    filepath = safe_join(billboard.app.static_folder, path)
+    if filepath is None or not os.path.isfile(filepath):
+        await send_json(send, 404, {'error': 'File not found'})
+        return
+    content_type = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+    await send_file(scope, send, filepath, content_type)
+
+
+async def handle_admin_memory(scope, send):
+    """GET /admin/memory"""
+    client = scope.get('client') or (None, None)
+    headers = dict(scope.get('headers') or [])
+    token = headers.get(b'x-admin-token', b'').decode('latin-1') or None
+    if not billboard.admin_allowed(client[0], token):
+        await send_json(send, 403, {'error': 'Forbidden'})
+        return
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        top = int(query.get('top', ['0'])[0])
+    except ValueError:
+        top = 0
+    # With a process executor this reports the server process, not the render workers
+    report = await asyncio.get_running_loop().run_in_executor(None, billboard.memory_report, top)
+    await send_json(send, 200, report)
+
+
+async def handle_admin_render_log(scope, send):
+    """GET /admin/render-log"""
+    client = scope.get('client') or (None, None)
+    headers = dict(scope.get('headers') or [])
+    token = headers.get(b'x-admin-token', b'').decode('latin-1') or None
+    if not billboard.admin_allowed(client[0], token):
+        await send_json(send, 403, {'error': 'Forbidden'})
+        return
+    # With a process executor the counters belong to the server process only
+    await send_json(send, 200, billboard.render_log.stats())
+
+
+async def lifespan(receive, send):
+    """Start and stop the render executor with the server"""
+    global render_executor, index_html
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                render_executor = make_executor()
+                if EXECUTOR_KIND == 'process':
+                    # Start every worker now rather than on the first requests
+                    for _ in range(RENDER_WORKERS):
+                        render_executor.submit(billboard.warm_caches)
+                index_html = render_index()
+                # Warm caches and pre-render popular signs without delaying readiness
+                billboard.start_warmup()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if render_executor is not None:
+                render_executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    global render_executor, index_html
+
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # Servers without lifespan support still get a working app
+    if render_executor is None:
+        render_executor = make_executor()
+    if index_html is None:
+        index_html = render_index()
+
+    method = scope['method']
+    path = scope['path']
+
+    if path == '/':
+        if method not in ('GET', 'HEAD'):
+            await send_json(send, 405, {'error': 'Method not allowed'})
+        else:
+            await send_response(send, 200, index_html, 'text/html; charset=utf-8')
+    elif path == '/generate':
+        if method != 'POST':
+            await send_json(send, 405, {'error': 'Method not allowed'})
+        else:
+            await handle_generate(receive, send)
+    elif path == '/admin/memory' and method in ('GET', 'HEAD'):
+        await handle_admin_memory(scope, send)
+    elif path == '/admin/render-log' and method in ('GET', 'HEAD'):
+        await handle_admin_render_log(scope, send)
+    elif path.startswith('/image/') and method in ('GET', 'HEAD'):
+        await handle_image(scope, send, path[len('/image/'):])
+    elif path.startswith('/static/') and method in ('GET', 'HEAD'):
+        await handle_static(scope, send, path[len('/static/'):])
+    else:
+        await send_json(send, 404, {'error': 'Not found'})
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark text effects rendering.
+
+Compares the cost each effect adds to generate_billboard() against running
+the same effect over the whole background, to show that effects scale with
+the text band rather than the image.
+
+Usage: python bench_effects.py [--runs N] [--font-size N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import app
+
+
+def time_call(fn, runs):
+    """Return the median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def full_frame_effects(size, effects):
+    """Run the effect kernels over a full-size mask, as a whole-image pass would"""
+    width, height = size
+    mask = np.zeros((height, width), dtype=np.float32)
+    if 'glow' in effects:
+        app.blur_mask(app.dilate_mask(mask, app.GLOW_RADIUS // 2), app.GLOW_RADIUS)
+    if 'shadow' in effects:
+        app.blur_mask(app.shift_mask(mask, app.SHADOW_OFFSET, app.SHADOW_OFFSET), app.SHADOW_BLUR)
+    if 'outline' in effects:
+        app.dilate_mask(mask, app.OUTLINE_WIDTH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--font-size', type=int, default=80)
+    parser.add_argument('--message', default=app.DEFAULT_SIGN_TEXT)
+    args = parser.parse_args()
+
+    # Warm the background cache so it is not counted
+    size = app.get_billboard_image().size
+    print(f"Background: {size[0]}x{size[1]} ({size[0] * size[1] / 1e6:.2f} MP)")
+
+    def render(effects):
+        return lambda: app.generate_billboard(args.message, args.font_size, '#000000', effects)
+
+    base = time_call(render(()), args.runs)
+    print(f"{'effects':<24}{'render ms':>12}{'added ms':>12}{'full-frame ms':>16}")
+    print(f"{'(none)':<24}{base:>12.2f}{0:>12.2f}{'-':>16}")
+
+    selections = [(name,) for name in app.TEXT_EFFECTS] + [app.TEXT_EFFECTS]
+    for effects in selections:
+        ms = time_call(render(effects), args.runs)
+        full = time_call(lambda: full_frame_effects(size, effects), max(1, args.runs // 4))
+        print(f"{'+'.join(effects):<24}{ms:>12.2f}{ms - base:>12.2f}{full:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark text layout separately from rasterizing.
+
+Compares the scalar float math generate_billboard used to do inline with
+building a LayoutPlan from scratch, looking one up in the plan cache, and
+placing many messages at once with compute_layouts(), and reports how long
+wrapping takes for the same messages.
+
+Usage: python bench_layout.py [--messages N]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+import app
+
+WORDS = ['GO', 'DUCKS', 'BEAVERS', 'WELCOME', 'TO', 'OREGON', 'FREEDOM', 'BURNS',
+         'HAPPY', 'BIRTHDAY', 'SIGN', 'SAY', 'ANYTHING', 'I-5', 'TRAFFIC', 'SALEM']
+
+
+def random_messages(count, seed=0):
+    rng = random.Random(seed)
+    return ['\n'.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+                      for _ in range(rng.randint(1, 4)))
+            for _ in range(count)]
+
+
+def scalar_layout(size, font_size, line_count):
+    """Line positions as generate_billboard computed them inline, before LayoutPlan"""
+    width, height = size
+    billboard_top = height * app.TEXT_TOP_PCT
+    billboard_bottom = height * app.TEXT_BOTTOM_PCT
+    available_height = billboard_bottom - billboard_top
+    line_height = min(font_size * 1.2 + app.LINE_SPACING_EXTRA, available_height / max(line_count, 1))
+    total_height = line_count * line_height
+    start_y = billboard_top
+    if total_height < available_height:
+        start_y = billboard_top + (available_height - total_height) / 2
+    start_y -= app.START_Y_OFFSET
+    left_margin = (width * 0.28) + 100
+    return [(left_margin, start_y + (i * line_height)) for i in range(line_count)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    args = parser.parse_args()
+
+    size = app.get_billboard_template().size
+    rng = random.Random(1)
+    font_sizes = [rng.choice(range(40, 361, 20)) for _ in range(args.messages)]
+    line_counts = [rng.randint(1, 8) for _ in range(args.messages)]
+    pairs = list(zip(font_sizes, line_counts))
+
+    scalar_ms, _ = timed(lambda: [scalar_layout(size, fs, n) for fs, n in pairs])
+    build_ms, _ = timed(lambda: [app.LayoutPlan(size, fs, n) for fs, n in pairs])
+    app.get_layout_plan.cache_clear()
+    [app.get_layout_plan(size, fs, n) for fs, n in pairs]
+    lookup_ms, _ = timed(lambda: [app.get_layout_plan(size, fs, n).positions for fs, n in pairs])
+    batch_ms, _ = timed(lambda: app.compute_layouts(size, np.array(font_sizes), np.array(line_counts)))
+
+    messages = random_messages(args.messages)
+    wrap_ms, _ = timed(lambda: app.layout_batch(messages, font_sizes, size))
+
+    per = 1000 / args.messages
+    print(f"{args.messages} layouts on a {size[0]}x{size[1]} template (us per message):")
+    print(f"  scalar inline layout    {scalar_ms * per:8.2f}")
+    print(f"  build LayoutPlan        {build_ms * per:8.2f}")
+    print(f"  cached plan lookup      {lookup_ms * per:8.2f}")
+    print(f"  compute_layouts batch   {batch_ms * per:8.2f}")
+    print(f"  layout_batch with wrap  {wrap_ms * per:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
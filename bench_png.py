@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark the incremental PNG encoder against Pillow's encoder.
+
+Renders messages with increasing numbers of lines, checks that the
+incremental output decodes to the same pixels as Pillow's, and reports
+encode time and size against the number of recompressed stripes.
+
+Usage: python bench_png.py [--runs N] [--font-size N]
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import app
+from incremental_png import IncrementalPNGEncoder
+
+
+def time_call(fn, runs):
+    """Return the median wall time of fn() in milliseconds and its last result"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), result
+
+
+def pillow_encode(img):
+    buffer = BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--font-size', type=int, default=80)
+    args = parser.parse_args()
+
+    template = app.get_billboard_template()
+    start = time.perf_counter()
+    encoder = IncrementalPNGEncoder(template)
+    print(f"Template {template.size[0]}x{template.size[1]} {template.mode}: "
+          f"{len(encoder.stripes)} stripes pre-compressed in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'lines':>5}{'dirty':>8}{'pillow ms':>12}{'incr ms':>10}{'pillow KB':>12}{'incr KB':>10}")
+    for line_count in range(0, 5):
+        message = '\n'.join(app.DEFAULT_SIGN_TEXT.split('\n')[:line_count])
+        img = app.generate_billboard(message, args.font_size)
+
+        pillow_ms, pillow_png = time_call(lambda: pillow_encode(img), args.runs)
+        incr_ms, incr_png = time_call(lambda: encoder.encode(img), args.runs)
+
+        decoded = Image.open(BytesIO(incr_png))
+        if not np.array_equal(np.asarray(decoded), np.asarray(img)):
+            raise SystemExit(f"Decoded pixels differ for {line_count} line(s)")
+
+        dirty = f"{len(encoder.dirty_stripes(img))}/{len(encoder.stripes)}"
+        print(f"{line_count:>5}{dirty:>8}{pillow_ms:>12.1f}{incr_ms:>10.1f}"
+              f"{len(pillow_png) / 1024:>12.0f}{len(incr_png) / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
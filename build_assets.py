@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Uncle Sam Billboard Generator - Static Asset Build
+
+Copies the files under static/ into static/dist/ with content-hashed names,
+writes gzip (and brotli, if the brotli package is installed) versions of
+text assets and WebP versions of images, and records everything in
+static/dist/manifest.json. The app rewrites url_for('static', ...) through
+the manifest and serves these files with immutable caching.
+
+Run after changing anything in static/:
+    python build_assets.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.html', '.json', '.txt'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+HASH_LENGTH = 10
+WEBP_QUALITY = 85
+
+
+def fingerprint(relpath, data):
+    """'css/styles.css' -> 'css/styles.<hash>.css'"""
+    root, ext = os.path.splitext(relpath)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f'{root}.{digest}{ext}'
+
+
+def write(relpath, data):
+    path = os.path.join(DIST_DIR, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def compress_text(data):
+    """Precompressed encodings that are smaller than the original, best first"""
+    encodings = {}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(data, quality=11)
+    # mtime=0 keeps the output reproducible
+    encodings['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+    return {name: body for name, body in encodings.items() if len(body) < len(data)}
+
+
+def image_variants(data, ext):
+    """Smaller re-encodings of an image: WebP, and an optimized original format"""
+    variants = {}
+    with Image.open(BytesIO(data)) as img:
+        img.load()
+        webp = BytesIO()
+        if ext == '.png':
+            img.save(webp, 'WEBP', quality=WEBP_QUALITY, method=6, exact=True)
+        else:
+            img.save(webp, 'WEBP', quality=WEBP_QUALITY, method=6)
+        variants['webp'] = webp.getvalue()
+
+        optimized = BytesIO()
+        if ext == '.png':
+            img.save(optimized, 'PNG', optimize=True)
+        else:
+            img.save(optimized, 'JPEG', quality=WEBP_QUALITY, optimize=True, progressive=True)
+        variants['optimized'] = optimized.getvalue()
+    return {name: body for name, body in variants.items() if len(body) < len(data)}
+
+
+def build():
+    """Rebuild static/dist and return the manifest"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            source = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(source, STATIC_DIR).replace(os.sep, '/')
+            ext = os.path.splitext(filename)[1].lower()
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            entry = {'file': fingerprint(relpath, data), 'size': len(data), 'encodings': {}}
+            if ext in IMAGE_EXTENSIONS:
+                variants = image_variants(data, ext)
+                if 'optimized' in variants:
+                    data = variants['optimized']
+                    entry['size'] = len(data)
+                if 'webp' in variants:
+                    entry['webp'] = fingerprint(os.path.splitext(relpath)[0] + '.webp', variants['webp'])
+                    write(entry['webp'], variants['webp'])
+            write(entry['file'], data)
+
+            if ext in TEXT_EXTENSIONS:
+                for encoding, body in compress_text(data).items():
+                    suffix = '.br' if encoding == 'br' else '.gz'
+                    entry['encodings'][encoding] = entry['file'] + suffix
+                    write(entry['file'] + suffix, body)
+
+            manifest[relpath] = entry
+            variants_note = ', '.join(list(entry['encodings']) + (['webp'] if 'webp' in entry else []))
+            print(f"{relpath} -> {entry['file']}" + (f" ({variants_note})" if variants_note else ''))
+
+    write(MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if brotli is None:
+        print("brotli is not installed; only gzip versions will be written", file=sys.stderr)
+    build()
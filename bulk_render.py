@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Uncle Sam Billboard Generator - Bulk Render CLI
+
+Renders billboards offline from a JSONL file (or stdin), one
+{message, fontSize, textColor} record per line, across a process pool.
+Output goes to a directory, or is streamed as a tar or zip archive.
+
+Usage:
+    python bulk_render.py signs.jsonl -o out/
+    python bulk_render.py signs.jsonl -o signs.tar.gz --workers 8 --unordered
+    cat signs.jsonl | python bulk_render.py - -o - --format tar > signs.tar
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+from itertools import islice
+
+import app
+
+# Records sent to a worker at once; their text is laid out in one app.layout_batch call
+CHUNK_SIZE = 4
+# How many chunks each worker may have queued ahead of the writer
+INFLIGHT_PER_WORKER = 2
+PROGRESS_INTERVAL = 2.0
+
+
+def init_worker():
+    """Warm the app's background, font and PNG encoder caches once per worker process"""
+    app.warm_caches()
+
+
+def render_chunk(chunk):
+    """Render a list of (line_number, line) JSONL records.
+
+    Returns a list of (index, name, png_bytes, error), one per record.
+    """
+    parsed = []
+    for index, line in chunk:
+        try:
+            data = json.loads(line)
+            parsed.append((index, data, app.normalize_request(data), None))
+        except Exception as e:
+            parsed.append((index, None, None, str(e)))
+
+    requests = [request for _, _, request, error in parsed if error is None]
+    try:
+        layouts = iter(app.layout_batch([request[0] for request in requests],
+                                        [request[1] for request in requests]))
+    except Exception:
+        # Lay each record out on its own so one bad message only fails its own line
+        layouts = None
+
+    results = []
+    for index, data, request, error in parsed:
+        if error is not None:
+            results.append((index, None, None, error))
+        else:
+            results.append(render_record(index, data, request,
+                                         next(layouts) if layouts is not None else None))
+    return results
+
+
+def render_record(index, data, request, layout=None):
+    """Render one parsed record and return (index, name, png_bytes, error)"""
+    try:
+        message, font_size, text_color, effects = request
+        img = app.generate_billboard(message, font_size, text_color, effects, layout=layout)
+        return index, output_name(index, data), app.encode_png(img), None
+    except Exception as e:
+        return index, None, None, str(e)
+
+
+def output_name(index, data):
+    """File name for a record: its 'name' field if given, else its line number"""
+    name = data.get('name') if isinstance(data, dict) else None
+    if name:
+        name = re.sub(r'[^A-Za-z0-9._-]+', '_', str(name)).strip('._')
+    return f'{name or f"billboard_{index:08d}"}.png'
+
+
+def unique_name(name, index, used):
+    """Append the line number to a name that was already written"""
+    if name in used:
+        root, ext = os.path.splitext(name)
+        name = f'{root}_{index}{ext}'
+    used.add(name)
+    return name
+
+
+def read_records(stream):
+    """Yield (line_number, line) for every non-blank input line"""
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line
+
+
+def chunked(records, size=CHUNK_SIZE):
+    """Group records into lists of up to size"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_pool(records, workers, ordered):
+    """Render records across a process pool, keeping a bounded number in flight.
+
+    Results are yielded in input order when ordered is true, otherwise as
+    soon as they complete. Input is only read as fast as results drain, so
+    memory stays flat regardless of input size. Records go to the workers
+    in chunks of CHUNK_SIZE.
+    """
+    window = max(1, workers * INFLIGHT_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pending = deque()
+        for chunk in chunked(records):
+            pending.append(pool.submit(render_chunk, chunk))
+            if len(pending) < window:
+                continue
+            yield from drain(pending, ordered, until=window - 1)
+        yield from drain(pending, ordered, until=0)
+
+
+def drain(pending, ordered, until):
+    """Yield results until at most `until` chunks are still pending"""
+    while len(pending) > until:
+        if ordered:
+            yield from pending.popleft().result()
+        else:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield from future.result()
+
+
+class DirectoryWriter:
+    """Write each render as a file in a directory"""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, name, data):
+        with open(os.path.join(self.path, name), 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class TarWriter:
+    """Stream renders into a tar archive (optionally gzip-compressed)"""
+
+    def __init__(self, fileobj, compress=False):
+        self.tar = tarfile.open(fileobj=fileobj, mode='w|gz' if compress else 'w|')
+
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, BytesIO(data))
+
+    def close(self):
+        self.tar.close()
+
+
+class ZipWriter:
+    """Stream renders into a zip archive (PNGs are stored, not recompressed)"""
+
+    def __init__(self, fileobj):
+        self.zip = zipfile.ZipFile(fileobj, mode='w', compression=zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        self.zip.writestr(name, data)
+
+    def close(self):
+        self.zip.close()
+
+
+def open_writer(output, fmt):
+    """Pick an output writer from --output and --format"""
+    if fmt is None:
+        if output.endswith(('.tar.gz', '.tgz')):
+            fmt = 'tar.gz'
+        elif output.endswith('.tar'):
+            fmt = 'tar'
+        elif output.endswith('.zip'):
+            fmt = 'zip'
+        elif output == '-':
+            fmt = 'tar'
+        else:
+            fmt = 'dir'
+
+    if fmt == 'dir':
+        return DirectoryWriter(output), None
+
+    fileobj = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    if fmt == 'zip':
+        writer = ZipWriter(fileobj)
+    else:
+        writer = TarWriter(fileobj, compress=(fmt == 'tar.gz'))
+    return writer, (None if output == '-' else fileobj)
+
+
+class Progress:
+    """Periodic progress and throughput reporting to stderr"""
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.rendered = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def update(self, size=0, failed=False):
+        if failed:
+            self.failed += 1
+        else:
+            self.rendered += 1
+            self.bytes += size
+        now = time.perf_counter()
+        if not self.quiet and now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None, final=False):
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.rendered / elapsed if elapsed else 0.0
+        prefix = 'Done' if final else 'Progress'
+        print(f"{prefix}: {self.rendered} rendered, {self.failed} failed, "
+              f"{self.bytes / 1e6:.1f} MB in {elapsed:.1f}s ({rate:.1f} renders/s)",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render billboards in bulk from JSONL specs')
+    parser.add_argument('input', help="JSONL file of {message, fontSize, textColor} records, or '-' for stdin")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Output directory, .tar/.tar.gz/.zip file, or '-' to stream to stdout")
+    parser.add_argument('--format', choices=['dir', 'tar', 'tar.gz', 'zip'],
+                        help='Output format (default: inferred from --output)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of render processes (default: CPU count)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='Write results as they finish instead of in input order')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print the final summary')
+    args = parser.parse_args()
+
+    # Warm caches before the pool forks so workers can share them
+    init_worker()
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    writer, fileobj = open_writer(args.output, args.format)
+    progress = Progress(quiet=args.quiet)
+
+    # Names already written, so repeated 'name' fields don't overwrite each other
+    used_names = set()
+
+    try:
+        results = run_pool(read_records(stream), args.workers, ordered=not args.unordered)
+        for index, name, data, error in results:
+            if error:
+                print(f"Line {index}: {error}", file=sys.stderr)
+                progress.update(failed=True)
+                continue
+            writer.write(unique_name(name, index, used_names), data)
+            progress.update(len(data))
+    finally:
+        writer.close()
+        if fileobj is not None:
+            fileobj.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    progress.report(final=True)
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
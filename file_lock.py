@@ -0,0 +1,38 @@
+"""
+Exclusive lock on a file shared by several processes.
+
+Uses fcntl.flock on POSIX and msvcrt.locking on Windows.
+"""
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on path, creating it if needed, until the block exits"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            # Released when the file is closed
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+            return
+
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                # LK_LOCK gives up after about 10 seconds; keep waiting like flock
+                continue
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,153 @@
+"""
+Incremental PNG encoder for renders drawn on a fixed background.
+
+The reference image is split into horizontal stripes. Each stripe is
+filtered and deflated on its own, ending in a full flush, so it is
+byte-aligned and independent of the stripes around it. Each stripe is then
+stored as its own IDAT chunk with a precomputed CRC. To encode a render,
+only the stripes that differ from the reference are filtered and
+compressed again. The pieces are spliced between a zlib header and a final
+empty block, and the Adler-32 of the whole stream is combined from the
+per-stripe checksums.
+
+Rows are Paeth-filtered, except the first row of each stripe, which uses
+the Sub filter so no stripe depends on the one above it.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# zlib header for a deflate stream with a 32K window and default compression
+ZLIB_HEADER = b'\x78\x9c'
+# Rows per independently compressed stripe
+STRIPE_ROWS = 16
+COMPRESS_LEVEL = 6
+# Pillow mode -> (PNG color type, bytes per pixel)
+COLOR_TYPES = {'L': (0, 1), 'RGB': (2, 3), 'LA': (4, 2), 'RGBA': (6, 4)}
+ADLER_BASE = 65521
+
+FILTER_SUB = 1
+FILTER_PAETH = 4
+
+
+def png_chunk(kind, data):
+    """Build a PNG chunk: length, type, data and CRC"""
+    crc = zlib.crc32(data, zlib.crc32(kind))
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+
+def adler32_combine(adler1, adler2, len2):
+    """Adler-32 of A + B from the checksums of A and B and the length of B"""
+    a1, b1 = adler1 & 0xFFFF, adler1 >> 16
+    a2, b2 = adler2 & 0xFFFF, adler2 >> 16
+    a = (a1 + a2 - 1) % ADLER_BASE
+    b = (b1 + b2 + len2 * (a1 - 1)) % ADLER_BASE
+    return (b << 16) | a
+
+
+def filter_stripe(rows, bpp):
+    """Filter one stripe of raw rows (height x row bytes) into PNG scanlines"""
+    raw = rows.astype(np.int16)
+    left = np.zeros_like(raw)
+    left[:, bpp:] = raw[:, :-bpp]
+    up = np.zeros_like(raw)
+    up[1:] = raw[:-1]
+    up_left = np.zeros_like(raw)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    # Paeth predictor; with no row above it reduces to Sub
+    p = left + up - up_left
+    pa = np.abs(p - left)
+    pb = np.abs(p - up)
+    pc = np.abs(p - up_left)
+    predicted = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+
+    scanlines = np.empty((raw.shape[0], raw.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 0] = FILTER_PAETH
+    scanlines[0, 0] = FILTER_SUB
+    scanlines[:, 1:] = (raw - predicted) & 0xFF
+    return scanlines.tobytes()
+
+
+def compress_stripe(data, level=COMPRESS_LEVEL):
+    """Raw-deflate one stripe, ending in a full flush so pieces can be spliced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+class IncrementalPNGEncoder:
+    """Encode images that differ from a reference image in only a few rows"""
+
+    def __init__(self, reference, compress_level=COMPRESS_LEVEL):
+        if reference.mode not in COLOR_TYPES:
+            raise ValueError(f"Unsupported image mode for incremental PNG: {reference.mode}")
+        self.size = reference.size
+        self.mode = reference.mode
+        self.compress_level = compress_level
+        color_type, self.bpp = COLOR_TYPES[self.mode]
+        width, height = self.size
+
+        self.reference = self._rows(reference)
+
+        header = PNG_SIGNATURE
+        header += png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+        icc_profile = reference.info.get('icc_profile')
+        if icc_profile:
+            header += png_chunk(b'iCCP', b'ICC Profile\0\0' + zlib.compress(icc_profile))
+        self.header = header + png_chunk(b'IDAT', ZLIB_HEADER)
+
+        # (IDAT chunk, Adler-32, uncompressed length) for each clean stripe
+        self.stripes = [self._encode_stripe(self.reference[top:top + STRIPE_ROWS])
+                        for top in range(0, height, STRIPE_ROWS)]
+
+    def _rows(self, img):
+        """Pixels as a (height, row bytes) uint8 array"""
+        width, height = img.size
+        return np.asarray(img).reshape(height, width * self.bpp)
+
+    def _encode_stripe(self, rows):
+        data = filter_stripe(rows, self.bpp)
+        compressed = compress_stripe(data, self.compress_level)
+        return png_chunk(b'IDAT', compressed), zlib.adler32(data), len(data)
+
+    def dirty_stripes(self, img):
+        """Indexes of the stripes where img differs from the reference"""
+        changed = np.any(self._rows(img) != self.reference, axis=1)
+        padded = np.zeros(len(self.stripes) * STRIPE_ROWS, dtype=bool)
+        padded[:len(changed)] = changed
+        return np.flatnonzero(padded.reshape(-1, STRIPE_ROWS).any(axis=1))
+
+    def accepts(self, img):
+        return img.size == self.size and img.mode == self.mode
+
+    def encode(self, img):
+        """Encode img as PNG bytes, recompressing only the changed stripes"""
+        if not self.accepts(img):
+            raise ValueError(f"Expected a {self.mode} image of size {self.size}")
+
+        stripes = list(self.stripes)
+        if len(stripes):
+            rows = self._rows(img)
+            for index in self.dirty_stripes(img):
+                top = index * STRIPE_ROWS
+                stripes[index] = self._encode_stripe(rows[top:top + STRIPE_ROWS])
+
+        adler = 1
+        for _, stripe_adler, length in stripes:
+            adler = adler32_combine(adler, stripe_adler, length)
+
+        # Empty final block, then the Adler-32 of all scanlines
+        trailer = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15).flush(zlib.Z_FINISH)
+        return b''.join([
+            self.header,
+            *(chunk for chunk, _, _ in stripes),
+            png_chunk(b'IDAT', trailer + struct.pack('>I', adler)),
+            png_chunk(b'IEND', b''),
+        ])
+
+    def save(self, img, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode(img))
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Uncle Sam Billboard Generator - Load Test Harness
+
+Drives /generate and /image/<filename> at a sweep of concurrency levels and
+reports throughput, latency percentiles, error rate and server RSS for each
+level. Results are written as JSON so runs against different server
+configurations can be compared.
+
+Usage:
+    python loadtest.py                                  # start app.py locally
+    python loadtest.py --url http://host:8080 --server-pid 1234
+    python loadtest.py --concurrency 1,2,4,8 --duration 30 --label gunicorn-4w \\
+        --server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} app:app"
+"""
+
+import argparse
+import json
+import os
+import random
+import secrets
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+
+# Same as app.DEFAULT_SIGN_TEXT; copied so the client does not import the server
+DEFAULT_SIGN_TEXT = "WELCOME TO OREGON\nMAKE THIS SIGN SAY ANYTHING\nTHERE ARE FOUR LINES IN HERE\nFEEL THE FREEDOM, IT BURNS"
+
+# Phrases used for the "repeated" part of the request mix
+POPULAR_MESSAGES = [
+    "MAKE AMERICA READ AGAIN",
+    "HAPPY BIRTHDAY DAD",
+    "GO BEAVERS",
+    "GO DUCKS",
+    "KEEP PORTLAND WEIRD",
+    "WILL YOU MARRY ME?",
+    "I-5 TRAFFIC IS A STATE OF MIND",
+    "SEE YOU IN SALEM",
+]
+
+DEFAULT_MIX = 'default=0.2,unique=0.5,repeated=0.3'
+RSS_SAMPLE_INTERVAL = 0.2
+SERVER_START_TIMEOUT = 30
+
+
+def parse_mix(text):
+    """Parse 'default=0.2,unique=0.5,repeated=0.3' into normalized weights"""
+    weights = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in ('default', 'unique', 'repeated'):
+            raise argparse.ArgumentTypeError(f"Unknown message kind: {kind}")
+        weights[kind] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("Mix weights must add up to more than zero")
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+def make_payload(mix, rng, nonce=''):
+    """Build a /generate request body according to the message mix.
+
+    Unique messages include the per-run nonce, so a rerun with the same seed
+    does not hit renders the server cached from an earlier run.
+    """
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if kind == 'default':
+        message = DEFAULT_SIGN_TEXT
+    elif kind == 'repeated':
+        message = rng.choice(POPULAR_MESSAGES)
+    else:
+        message = f"UNIQUE SIGN {nonce} {rng.getrandbits(48):012X}"
+    return kind, {'message': message, 'fontSize': 80, 'textColor': '#000000'}
+
+
+def process_tree_rss(pid):
+    """Resident set size in bytes of a process and all its descendants (Linux only)"""
+    children = {}
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces, so split after the closing paren
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+    except OSError:
+        return None
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+        stack.extend(children.get(current, []))
+    return total or None
+
+
+class RssSampler:
+    """Sample server RSS in the background while a level runs"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = process_tree_rss(self.pid)
+            if rss:
+                self.samples.append(rss)
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def summary(self):
+        if not self.samples:
+            return None
+        return {'start': self.samples[0], 'end': self.samples[-1], 'peak': max(self.samples)}
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds"""
+    if not samples:
+        return None
+    values = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'mean': round(float(values.mean()), 2),
+        'p50': round(float(np.percentile(values, 50)), 2),
+        'p95': round(float(np.percentile(values, 95)), 2),
+        'p99': round(float(np.percentile(values, 99)), 2),
+        'max': round(float(values.max()), 2),
+    }
+
+
+def client_loop(base_url, mix, deadline, seed, nonce, fetch_image, timeout):
+    """Issue generate (and image) requests until the deadline; return raw results"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    results = []
+    while time.perf_counter() < deadline:
+        kind, payload = make_payload(mix, rng, nonce)
+        record = {'kind': kind, 'generate': None, 'image': None, 'error': None, 'bytes': 0}
+        start = time.perf_counter()
+        try:
+            response = session.post(f'{base_url}/generate', json=payload, timeout=timeout)
+            record['generate'] = time.perf_counter() - start
+            body = response.json()
+            if response.status_code != 200 or not body.get('success'):
+                raise RuntimeError(body.get('error') or f'HTTP {response.status_code}')
+            if fetch_image:
+                start = time.perf_counter()
+                image = session.get(f"{base_url}{body['url']}", timeout=timeout)
+                record['image'] = time.perf_counter() - start
+                if image.status_code != 200:
+                    raise RuntimeError(f'image HTTP {image.status_code}')
+                record['bytes'] = len(image.content)
+        except Exception as e:
+            record['error'] = str(e) or type(e).__name__
+        results.append(record)
+    session.close()
+    return results
+
+
+def run_level(base_url, concurrency, args, server_pid):
+    """Run one concurrency level and summarize it"""
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    with RssSampler(server_pid) as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(client_loop, base_url, args.mix, deadline,
+                                   args.seed + concurrency * 1000 + i, args.nonce,
+                                   not args.no_image, args.timeout)
+                       for i in range(concurrency)]
+            results = [record for future in futures for record in future.result()]
+    elapsed = time.perf_counter() - started
+
+    errors = [r for r in results if r['error']]
+    ok = [r for r in results if not r['error']]
+    by_kind = {}
+    for r in ok:
+        by_kind.setdefault(r['kind'], []).append(r['generate'])
+
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': len(results),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(results), 4) if results else 0.0,
+        'sample_errors': sorted({r['error'] for r in errors})[:5],
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'image_bytes_per_s': round(sum(r['bytes'] for r in ok) / elapsed) if elapsed else 0,
+        'generate_ms': percentiles([r['generate'] for r in ok]),
+        'generate_ms_by_kind': {kind: percentiles(samples) for kind, samples in by_kind.items()},
+        'image_ms': percentiles([r['image'] for r in ok if r['image'] is not None]),
+        'server_rss_bytes': sampler.summary(),
+    }
+
+
+def start_server(command, port):
+    """Start the app locally and wait until it answers"""
+    if command:
+        argv = shlex.split(command.format(port=port))
+    else:
+        argv = [sys.executable, '-c',
+                f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(argv, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            requests.get(f'{base_url}/', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test /generate and /image/<filename>')
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--server-pid', type=int, help='PID of the target server, for RSS reporting')
+    parser.add_argument('--server-cmd',
+                        help="Command used to start the server; '{port}' is substituted "
+                             "(default: Flask's threaded server)")
+    parser.add_argument('--port', type=int, default=8765, help='Port for a locally started server')
+    parser.add_argument('--concurrency', default='1,2,4,8',
+                        help='Comma-separated concurrency levels to sweep')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Message mix weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--no-image', action='store_true', help='Only call /generate')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seeds the message kinds and phrases of each client')
+    parser.add_argument('--nonce', default=secrets.token_hex(4).upper(),
+                        help='Added to unique messages (default: random per run)')
+    parser.add_argument('--label', default='', help='Free-form name for this configuration')
+    parser.add_argument('-o', '--output', help='Results file (default: loadtest_<timestamp>.json)')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    process = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        server_pid = args.server_pid
+    else:
+        process, base_url = start_server(args.server_cmd, args.port)
+        server_pid = process.pid
+
+    results = []
+    try:
+        for concurrency in levels:
+            level = run_level(base_url, concurrency, args, server_pid)
+            results.append(level)
+            latency = level['generate_ms'] or {}
+            rss = (level['server_rss_bytes'] or {}).get('peak')
+            print(f"c={concurrency:<4} {level['throughput_rps']:>7.2f} req/s  "
+                  f"p50 {latency.get('p50', 0):>8.1f}ms  p95 {latency.get('p95', 0):>8.1f}ms  "
+                  f"p99 {latency.get('p99', 0):>8.1f}ms  errors {level['error_rate']:.1%}  "
+                  f"rss {rss / 1e6 if rss else 0:.0f} MB")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report = {
+        'label': args.label,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'target': base_url,
+        'server_cmd': args.server_cmd if not args.url else None,
+        'duration_per_level_s': args.duration,
+        'mix': args.mix,
+        'seed': args.seed,
+        'nonce': args.nonce,
+        'fetch_image': not args.no_image,
+        'levels': results,
+    }
+    output = args.output or f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
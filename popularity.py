@@ -0,0 +1,263 @@
+"""
+Compact frequency record of render requests.
+
+A count-min sketch estimates how often each normalized request has been
+seen in fixed memory. A small candidate table keeps the requests with the
+highest estimates so the most popular ones can be listed and pre-rendered.
+Both are persisted to a JSON file from a background thread so counts
+survive restarts without writing to disk on the request path.
+"""
+
+import base64
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from file_lock import locked
+
+SKETCH_DEPTH = 4
+SKETCH_WIDTH = 4096
+# Requests tracked by name; everything else only lives in the sketch
+MAX_CANDIDATES = 256
+# Halve all counts once this many requests have been recorded, so old favourites fade
+DECAY_AFTER = 100000
+
+
+class CountMinSketch:
+    """Count-min sketch over string keys with numpy counters"""
+
+    def __init__(self, depth=SKETCH_DEPTH, width=SKETCH_WIDTH, counts=None):
+        self.depth = depth
+        self.width = width
+        self.counts = counts if counts is not None else np.zeros((depth, width), dtype=np.uint32)
+        self._rows = np.arange(depth)
+
+    def _columns(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype='<u4') % self.width
+
+    def add(self, key, count=1):
+        """Add count to key and return its new estimate"""
+        columns = self._columns(key)
+        self.counts[self._rows, columns] += count
+        return int(self.counts[self._rows, columns].min())
+
+    def estimate(self, key):
+        return int(self.counts[self._rows, self._columns(key)].min())
+
+    def halve(self):
+        self.counts >>= 1
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'width': self.width,
+            'counts': base64.b64encode(self.counts.astype('<u4').tobytes()).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = np.frombuffer(base64.b64decode(data['counts']), dtype='<u4')
+        counts = counts.reshape(data['depth'], data['width']).astype(np.uint32)
+        return cls(data['depth'], data['width'], counts)
+
+
+class PopularRequests:
+    """Track request frequencies and remember the most popular requests"""
+
+    def __init__(self, path=None, max_candidates=MAX_CANDIDATES, save_interval=60.0):
+        self.path = path
+        self.max_candidates = max_candidates
+        self.save_interval = save_interval
+        self.sketch = CountMinSketch()
+        self.recorded = 0
+        # key -> request payload for the current heavy hitters
+        self.candidates = {}
+        # Min-heap of (estimate, key) over the candidates. Estimates only grow
+        # between halvings, so stale entries are refreshed when they reach the top
+        self._heap = []
+        # Counts and total as of the last load or save. What this process added
+        # since then is merged into the file, so several workers can share it
+        self._base_counts = self.sketch.counts.copy()
+        self._base_recorded = 0
+        self._since_decay = 0
+        self._pending_halvings = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saver_pid = None
+
+    def record(self, key, payload):
+        """Count one occurrence of a request"""
+        self._ensure_saver()
+        with self._lock:
+            estimate = self.sketch.add(key)
+            self.recorded += 1
+            self._since_decay += 1
+            self._dirty = True
+            if self._since_decay >= DECAY_AFTER:
+                self.sketch.halve()
+                self._base_counts >>= 1
+                self._pending_halvings += 1
+                self._since_decay = 0
+                self._rebuild_heap()
+
+            if key not in self.candidates:
+                if len(self.candidates) < self.max_candidates:
+                    self.candidates[key] = payload
+                    heapq.heappush(self._heap, (estimate, key))
+                else:
+                    weakest, weakest_estimate = self._weakest()
+                    if weakest_estimate < estimate:
+                        del self.candidates[weakest]
+                        heapq.heapreplace(self._heap, (estimate, key))
+                        self.candidates[key] = payload
+
+    def _weakest(self):
+        """The candidate with the lowest estimate, left at the top of the heap"""
+        while True:
+            count, key = self._heap[0]
+            if key not in self.candidates:
+                heapq.heappop(self._heap)
+                continue
+            current = self.sketch.estimate(key)
+            if current == count:
+                return key, count
+            heapq.heapreplace(self._heap, (current, key))
+
+    def _rebuild_heap(self):
+        """Rebuild the heap, dropping the weakest candidates beyond max_candidates"""
+        ranked = sorted(((self.sketch.estimate(key), key) for key in self.candidates), reverse=True)
+        for _, key in ranked[self.max_candidates:]:
+            del self.candidates[key]
+        self._heap = ranked[:self.max_candidates]
+        heapq.heapify(self._heap)
+
+    def _ensure_saver(self):
+        # Save from a background thread, started again in each forked worker
+        if not self.path or self._saver_pid == os.getpid():
+            return
+        with self._lock:
+            if self._saver_pid == os.getpid():
+                return
+            self._saver_pid = os.getpid()
+        threading.Thread(target=self._save_periodically, name='popularity-save', daemon=True).start()
+
+    def _save_periodically(self):
+        while True:
+            time.sleep(self.save_interval)
+            self.save()
+
+    def top(self, n):
+        """The n most frequently seen requests as (count, payload), most popular first"""
+        with self._lock:
+            ranked = sorted(((self.sketch.estimate(key), payload)
+                             for key, payload in self.candidates.items()),
+                            key=lambda item: item[0], reverse=True)
+        return ranked[:n]
+
+    def save(self):
+        """Merge the counts recorded since the last save into the file on disk.
+
+        Workers sharing the file each add only their own new counts, under an
+        exclusive lock, and then pick up everyone else's. With nothing new to
+        add, this reloads the file instead.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            dirty = self._dirty
+            if dirty:
+                counts = self.sketch.counts.copy()
+                recorded = self.recorded
+                candidates = dict(self.candidates)
+                halvings = self._pending_halvings
+                self._dirty = False
+                self._pending_halvings = 0
+        if not dirty:
+            # Nothing to add, but other workers may have saved theirs
+            self.load()
+            return
+
+        try:
+            with locked(f'{self.path}.lock'):
+                on_disk = self._read()
+                merged = np.maximum(counts.astype(np.int64) - self._base_counts, 0)
+                merged_recorded = recorded - self._base_recorded
+                if on_disk is not None and on_disk[0].counts.shape == counts.shape:
+                    sketch, disk_candidates, disk_recorded = on_disk
+                    # Counts recorded here were already halved as they aged
+                    merged += sketch.counts.astype(np.int64) >> halvings
+                    merged_recorded += disk_recorded
+                    candidates = {**disk_candidates, **candidates}
+                merged = merged.astype(np.uint32)
+                self._write(merged, merged_recorded, candidates)
+        except OSError as e:
+            print(f"Error saving popular requests: {e}")
+            with self._lock:
+                self._dirty = True
+                self._pending_halvings += halvings
+            return
+
+        with self._lock:
+            # Keep whatever was recorded while the file was being written
+            added = np.maximum(self.sketch.counts.astype(np.int64) - counts, 0)
+            self.sketch.counts = (merged + added).astype(np.uint32)
+            self._base_counts = merged.copy()
+            self.recorded = merged_recorded + self.recorded - recorded
+            self._base_recorded = merged_recorded
+            new_keys = {key: payload for key, payload in self.candidates.items()
+                        if key not in candidates}
+            self.candidates = {**candidates, **new_keys}
+            self._rebuild_heap()
+
+    def _write(self, counts, recorded, candidates):
+        sketch = CountMinSketch(*counts.shape, counts)
+        ranked = sorted(candidates, key=sketch.estimate, reverse=True)
+        data = {
+            'recorded': recorded,
+            'sketch': sketch.to_dict(),
+            'candidates': [{'key': key, 'request': candidates[key]}
+                           for key in ranked[:self.max_candidates]],
+        }
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        """(sketch, candidates, recorded) from the file, or None if there is none"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            sketch = CountMinSketch.from_dict(data['sketch'])
+            candidates = {entry['key']: entry['request'] for entry in data['candidates']}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading popular requests: {e}")
+            return None
+        return sketch, candidates, data.get('recorded', 0)
+
+    def load(self):
+        """Load saved counts, if any, unless requests were recorded since the last save"""
+        if not self.path:
+            return
+        on_disk = self._read()
+        if on_disk is None:
+            return
+        sketch, candidates, recorded = on_disk
+        with self._lock:
+            if self._dirty:
+                # The next save() merges the file with what was recorded here
+                return
+            self.sketch = sketch
+            self.candidates = candidates
+            self.recorded = recorded
+            self._base_counts = sketch.counts.copy()
+            self._base_recorded = recorded
+            self._rebuild_heap()
@@ -0,0 +1,144 @@
+"""
+Asynchronous structured log of render records.
+
+Callers hand records to a bounded in-memory queue and never wait on disk.
+A background thread drains the queue in batches and appends them as JSON
+lines to a size-rotated file, which several processes may share. Records
+are sampled at a configurable rate, and records that arrive while the
+queue is full are dropped and counted.
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+
+from file_lock import locked
+
+# Most records appended to the file in one write
+BATCH_SIZE = 256
+
+
+class RenderLog:
+    """Bounded, sampled, background-written JSONL log"""
+
+    def __init__(self, path, sample_rate=1.0, queue_size=10000,
+                 max_bytes=10 * 1024 * 1024, backups=5):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.offered = 0
+        self.sampled = 0
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.path) and self.sample_rate > 0
+
+    def should_sample(self):
+        """Decide up front whether to build a record at all"""
+        with self._counter_lock:
+            self.offered += 1
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def log(self, record):
+        """Queue a record without blocking; drops it if the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+        with self._counter_lock:
+            self.sampled += 1
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'sample_rate': self.sample_rate,
+            'offered': self.offered,
+            'sampled': self.sampled,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _ensure_started(self):
+        # A forked child does not inherit the writer thread, so start a new one
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='render-log', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def close(self, timeout=2.0):
+        """Write out queued records and stop the writer thread"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            self._thread.join(timeout)
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in batch)
+        try:
+            # Several processes may share the file; only one rotates or appends at a time
+            with locked(f'{self.path}.lock'):
+                self._rotate_if_needed(len(data))
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+            with self._counter_lock:
+                self.written += len(batch)
+        except OSError as e:
+            with self._counter_lock:
+                self.errors += 1
+            print(f"Error writing render log: {e}")
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
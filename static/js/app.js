@@ -76,6 +76,7 @@ const messageInput = document.getElementById('messageInput');
 const fontSizeSlider = document.getElementById('fontSize');
 const fontSizeValue = document.getElementById('fontSizeValue');
 const textColorInput = document.getElementById('textColor');
+const effectInputs = document.querySelectorAll('input[name="effect"]');
 const charCount = document.getElementById('charCount');
 const generateBtn = document.getElementById('generateBtn');
 const downloadBtn = document.getElementById('downloadBtn');
@@ -102,6 +103,7 @@ generateBtn.addEventListener('click', async function() {
     const message = messageInput.value;
     const fontSize = fontSizeSlider.value;
     const textColor = textColorInput.value;
+    const effects = Array.from(effectInputs).filter(input => input.checked).map(input => input.value);
     
     // Disable button during generation
     generateBtn.disabled = true;
@@ -117,7 +119,8 @@ generateBtn.addEventListener('click', async function() {
             body: JSON.stringify({
                 message: message,
                 fontSize: fontSize,
-                textColor: textColor
+                textColor: textColor,
+                effects: effects
             })
         });
         
@@ -125,6 +128,10 @@ generateBtn.addEventListener('click', async function() {
         
         if (data.success) {
             currentImageUrl = data.url;
+            // Let the browser pick the smallest render that fits the preview
+            billboardPreview.srcset = (data.srcset || [])
+                .map(entry => `${entry.url} ${entry.width}w`)
+                .join(', ');
             billboardPreview.src = currentImageUrl;
             billboardPreview.style.display = 'block';
             loading.style.display = 'none';
@@ -157,6 +164,7 @@ resetBtn.addEventListener('click', function() {
     fontSizeSlider.value = 80;
     fontSizeValue.textContent = '80px';
     textColorInput.value = '#000000';
+    effectInputs.forEach(input => { input.checked = false; });
     charCount.textContent = '101/200';
     billboardPreview.style.display = 'none';
     loading.style.display = 'block';
@@ -0,0 +1,95 @@
+"""
+Tests for the request handling helpers in app.py.
+
+Run with:
+    python -m pytest -q
+"""
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def render_version(monkeypatch):
+    """Set RENDER_VERSION and recompute the render fingerprint around a test"""
+    def set_version(version):
+        monkeypatch.setattr(app, 'RENDER_VERSION', version)
+        app.render_fingerprint.cache_clear()
+    yield set_version
+    monkeypatch.undo()
+    app.render_fingerprint.cache_clear()
+
+
+def test_cache_basename_follows_render_version(render_version):
+    key = app.request_key(*app.normalize_request({'message': 'go ducks'}))
+    render_version(1)
+    before = app.cache_basename(key)
+    assert app.cache_basename(key) == before
+    render_version(2)
+    assert app.cache_basename(key) != before
+
+
+@pytest.fixture
+def assets(monkeypatch):
+    """A built image with a WebP copy and a stylesheet with br and gzip copies"""
+    monkeypatch.setattr(app, 'assets_by_file', {
+        'img/bg.abc.png': {'file': 'img/bg.abc.png', 'webp': 'img/bg.def.webp', 'encodings': {}},
+        'css/site.abc.css': {'file': 'css/site.abc.css',
+                             'encodings': {'br': 'css/site.abc.css.br',
+                                           'gzip': 'css/site.abc.css.gz'}},
+    })
+
+
+def served(filename, accept_encoding='', accept=''):
+    path, mimetype, headers = app.resolve_asset(filename, accept_encoding, accept)
+    return path[len(app.ASSET_DIST_DIR) + 1:], mimetype, headers
+
+
+@pytest.mark.parametrize('accept, webp', [
+    ('image/webp,image/*;q=0.8', True),
+    ('image/avif,IMAGE/WEBP;q=0.5', True),
+    ('', False),
+    ('*/*', False),
+    ('image/png,image/*;q=0.8,*/*;q=0.5', False),
+    ('image/webp;q=0,image/*', False),
+])
+def test_resolve_asset_webp_needs_explicit_accept(assets, accept, webp):
+    path, mimetype, headers = served('img/bg.abc.png', accept=accept)
+    if webp:
+        assert (path, mimetype) == ('img/bg.def.webp', 'image/webp')
+    else:
+        assert (path, mimetype) == ('img/bg.abc.png', 'image/png')
+    assert headers['Vary'] == 'Accept'
+    assert 'Content-Encoding' not in headers
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_resolve_asset_precompressed_encodings(assets, accept_encoding, encoding):
+    path, mimetype, headers = served('css/site.abc.css', accept_encoding=accept_encoding)
+    assert mimetype == 'text/css'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers.get('Content-Encoding') == encoding
+    suffix = {'br': '.br', 'gzip': '.gz', None: ''}[encoding]
+    assert path == 'css/site.abc.css' + suffix
+
+
+def test_resolve_asset_unknown_file(assets):
+    assert app.resolve_asset('css/site.css', 'gzip', '*/*') is None
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_wsgi_warmup_starts_with_first_request(monkeypatch, enabled):
+    calls = []
+    monkeypatch.setattr(app, 'WARMUP_ON_IMPORT', enabled)
+    monkeypatch.setattr(app, 'start_warmup', lambda: calls.append(True))
+    client = app.app.test_client()
+    client.get('/')
+    client.get('/')
+    assert len(calls) == (2 if enabled else 0)
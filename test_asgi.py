@@ -0,0 +1,172 @@
+"""
+Tests for asgi.py: range and conditional file requests, and /generate.
+
+Run with:
+    python -m pytest -q
+"""
+
+import asyncio
+import json
+import os
+from email.utils import formatdate
+
+import pytest
+
+import asgi
+
+SIZE = 1000
+BODY = bytes(range(256)) * 3 + bytes(SIZE - 768)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('bytes=0-9', (0, 9)),
+    ('bytes=10-', (10, SIZE - 1)),
+    ('bytes=990-5000', (990, SIZE - 1)),
+    ('bytes=-5', (SIZE - 5, SIZE - 1)),
+    ('bytes=-5000', (0, SIZE - 1)),
+    ('BYTES = 3-3', (3, 3)),
+    # Ignored, so the whole file is sent
+    ('bytes=9-0', None),
+    ('bytes=0-1,5-6', None),
+    ('items=0-9', None),
+    ('bytes=x-', None),
+    ('bytes=-', None),
+])
+def test_parse_range(value, expected):
+    assert asgi.parse_range(value, SIZE) == expected
+
+
+@pytest.mark.parametrize('value', ['bytes=-0', 'bytes=1000-', 'bytes=2000-3000'])
+def test_parse_range_unsatisfiable(value):
+    with pytest.raises(ValueError):
+        asgi.parse_range(value, SIZE)
+
+
+def test_parse_range_empty_file():
+    with pytest.raises(ValueError):
+        asgi.parse_range('bytes=-5', 0)
+
+
+ETAG = '"abc-3e8"'
+MTIME = 1700000000.5
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, False),
+    ({b'if-none-match': ETAG.encode()}, True),
+    ({b'if-none-match': b'W/' + ETAG.encode()}, True),
+    ({b'if-none-match': b'"other", ' + ETAG.encode()}, True),
+    ({b'if-none-match': b'*'}, True),
+    ({b'if-none-match': b'"other"'}, False),
+    ({b'if-modified-since': formatdate(MTIME + 60, usegmt=True).encode()}, True),
+    ({b'if-modified-since': formatdate(MTIME, usegmt=True).encode()}, True),
+    ({b'if-modified-since': formatdate(MTIME - 60, usegmt=True).encode()}, False),
+    ({b'if-modified-since': b'not a date'}, False),
+    # If-None-Match wins over If-Modified-Since
+    ({b'if-none-match': b'"other"',
+      b'if-modified-since': formatdate(MTIME + 60, usegmt=True).encode()}, False),
+])
+def test_not_modified(headers, expected):
+    assert asgi.not_modified(headers, ETAG, MTIME) is expected
+
+
+@pytest.fixture
+def served_file(tmp_path):
+    path = tmp_path / 'sign.png'
+    path.write_bytes(BODY)
+    st = os.stat(path)
+    return str(path), f'"{st.st_mtime_ns:x}-{SIZE:x}"'
+
+
+def fetch(path, **headers):
+    """Run send_file and return (status, headers, body)"""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'headers': [(name.replace('_', '-').encode(), value.encode())
+                         for name, value in headers.items()]}
+    asyncio.run(asgi.send_file(scope, send, path, 'image/png'))
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+def test_send_file_full(served_file):
+    path, etag = served_file
+    status, headers, body = fetch(path)
+    assert status == 200
+    assert body == BODY
+    assert headers[b'etag'] == etag.encode()
+    assert headers[b'content-length'] == str(SIZE).encode()
+    assert headers[b'accept-ranges'] == b'bytes'
+
+
+def test_send_file_not_modified(served_file):
+    path, etag = served_file
+    status, headers, body = fetch(path, if_none_match=f'W/{etag}')
+    assert (status, body) == (304, b'')
+    assert headers[b'etag'] == etag.encode()
+
+
+@pytest.mark.parametrize('value, start, end', [('bytes=100-199', 100, 199), ('bytes=-10', 990, 999)])
+def test_send_file_range(served_file, value, start, end):
+    path, etag = served_file
+    status, headers, body = fetch(path, range=value)
+    assert status == 206
+    assert body == BODY[start:end + 1]
+    assert headers[b'content-range'] == f'bytes {start}-{end}/{SIZE}'.encode()
+    assert headers[b'content-length'] == str(end - start + 1).encode()
+
+
+def test_send_file_unsatisfiable_range(served_file):
+    path, _ = served_file
+    status, headers, body = fetch(path, range='bytes=-0')
+    assert (status, body) == (416, b'')
+    assert headers[b'content-range'] == f'bytes */{SIZE}'.encode()
+
+
+@pytest.mark.parametrize('if_range, status', [
+    (None, 206),
+    ('current', 206),
+    ('"stale-etag"', 200),
+    # If-Range needs a strong match, so a weak tag sends the whole file
+    ('weak', 200),
+])
+def test_send_file_if_range(served_file, if_range, status):
+    path, etag = served_file
+    headers = {'range': 'bytes=0-9'}
+    if if_range is not None:
+        headers['if_range'] = {'current': etag, 'weak': f'W/{etag}'}.get(if_range, if_range)
+    got_status, _, body = fetch(path, **headers)
+    assert got_status == status
+    assert body == (BODY[:10] if status == 206 else BODY)
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_handle_generate_normalizes_once(monkeypatch, kind):
+    calls = []
+    normalize = asgi.billboard.normalize_request
+    monkeypatch.setattr(asgi, 'EXECUTOR_KIND', kind)
+    # A thread pool stands in for the process pool; only the call pattern matters here
+    monkeypatch.setattr(asgi, 'render_executor', asgi.ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(asgi.billboard, 'normalize_request',
+                        lambda data: calls.append(data) or normalize(data))
+    monkeypatch.setattr(asgi.billboard, 'record_request', lambda normalized: None)
+    monkeypatch.setattr(asgi.billboard, 'render_normalized',
+                        lambda normalized, record=True, warmup=False, reserve=True:
+                        {'success': True, 'effects': list(normalized[3]), 'reserve': reserve})
+    messages = []
+
+    async def receive():
+        return {'body': b'{"message": "go", "effects": ["shadow"]}', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.handle_generate(receive, send))
+    assert len(calls) == 1
+    assert messages[0]['status'] == 200
+    assert json.loads(messages[1]['body']) == {'success': True, 'effects': ['shadow'],
+                                               'reserve': kind == 'thread'}
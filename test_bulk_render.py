@@ -0,0 +1,46 @@
+"""
+Tests for bulk_render's per-chunk rendering.
+
+Run with:
+    python -m pytest -q
+"""
+
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import app
+import bulk_render
+
+CHUNK = [
+    (1, '{"message": "go ducks", "fontSize": 120}'),
+    (2, 'not json'),
+    (3, '{"message": "happy birthday\\n\\ndad", "name": "dad"}'),
+]
+
+
+def decode(png):
+    with Image.open(BytesIO(png)) as img:
+        return np.asarray(img)
+
+
+def check_results(results):
+    assert [index for index, *_ in results] == [1, 2, 3]
+    (_, name1, png1, error1), (_, name2, png2, error2), (_, name3, png3, error3) = results
+    assert (name1, error1) == ('billboard_00000001.png', None)
+    assert name2 is None and png2 is None and error2
+    assert (name3, error3) == ('dad.png', None)
+    expected = app.generate_billboard('go ducks', 120)
+    assert np.array_equal(decode(png1), np.asarray(expected))
+
+
+def test_render_chunk_matches_direct_render():
+    check_results(bulk_render.render_chunk(CHUNK))
+
+
+def test_render_chunk_survives_layout_failure(monkeypatch):
+    def fail(messages, font_sizes):
+        raise UnicodeEncodeError('latin-1', 'x', 0, 1, 'not encodable')
+    monkeypatch.setattr(app, 'layout_batch', fail)
+    check_results(bulk_render.render_chunk(CHUNK))
@@ -0,0 +1,92 @@
+"""
+Round-trip tests for incremental_png: every encoded image must decode to
+exactly the pixels it was given.
+
+Run with:
+    python -m pytest -q
+"""
+
+import struct
+import zlib
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import app
+from incremental_png import PNG_SIGNATURE, STRIPE_ROWS, IncrementalPNGEncoder
+
+
+def background(mode, size, seed=0):
+    rng = np.random.default_rng(seed)
+    bands = len(mode)
+    shape = (size[1], size[0], bands) if bands > 1 else (size[1], size[0])
+    return Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8), mode)
+
+
+def with_text(img):
+    img = img.copy()
+    ImageDraw.Draw(img).text((5, img.height // 3), 'GO DUCKS', fill='white')
+    return img
+
+
+def idat_data(png):
+    """Concatenated IDAT payloads of a PNG"""
+    assert png.startswith(PNG_SIGNATURE)
+    offset = len(PNG_SIGNATURE)
+    data = b''
+    while offset < len(png):
+        length, kind = struct.unpack('>I4s', png[offset:offset + 8])
+        if kind == b'IDAT':
+            data += png[offset + 8:offset + 8 + length]
+        offset += 12 + length
+    return data
+
+
+def assert_round_trip(encoder, img):
+    png = encoder.encode(img)
+    # Decompressing checks the spliced stream and its combined adler32
+    zlib.decompress(idat_data(png))
+    with Image.open(BytesIO(png)) as decoded:
+        assert decoded.mode == img.mode
+        assert decoded.size == img.size
+        assert np.array_equal(np.asarray(decoded), np.asarray(img))
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'L'])
+@pytest.mark.parametrize('height', [STRIPE_ROWS * 4, STRIPE_ROWS * 4 + 5])
+def test_partially_dirty(mode, height):
+    reference = background(mode, (97, height))
+    encoder = IncrementalPNGEncoder(reference)
+    img = with_text(reference)
+    assert 0 < len(encoder.dirty_stripes(img)) < len(encoder.stripes)
+    assert_round_trip(encoder, img)
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'L'])
+def test_unchanged_and_all_dirty(mode):
+    reference = background(mode, (64, STRIPE_ROWS * 3 + 1))
+    encoder = IncrementalPNGEncoder(reference)
+    assert_round_trip(encoder, reference)
+
+    img = background(mode, reference.size, seed=1)
+    assert len(encoder.dirty_stripes(img)) == len(encoder.stripes)
+    assert_round_trip(encoder, img)
+
+
+def test_rejects_other_sizes():
+    encoder = IncrementalPNGEncoder(background('RGB', (32, 32)))
+    assert not encoder.accepts(background('RGB', (32, 33)))
+    assert not encoder.accepts(background('L', (32, 32)))
+
+
+def test_pyramid_encoders():
+    encoders = app.get_png_encoders()
+    template = app.get_billboard_template()
+    img = app.generate_billboard('GO BEAVERS', 120, '#123456')
+    variants = [(template.width, img)] + app.build_pyramid(img)
+    assert {variant.size for _, variant in variants} <= set(encoders)
+    assert sorted(width for width, _ in variants[1:]) == sorted(app.OUTPUT_WIDTHS)
+    for _, variant in variants:
+        assert_round_trip(encoders[variant.size], variant)
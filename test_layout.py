@@ -0,0 +1,75 @@
+"""
+Tests for text layout: LayoutPlan, compute_layouts() and layout_batch()
+must place lines exactly where generate_billboard always has.
+
+Run with:
+    python -m pytest -q
+"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import app
+
+SIZE = (1784, 1166)
+
+
+def scalar_positions(size, font_size, line_count):
+    """The float math generate_billboard did inline before LayoutPlan"""
+    width, height = size
+    billboard_top = height * app.TEXT_TOP_PCT
+    billboard_bottom = height * app.TEXT_BOTTOM_PCT
+    available_height = billboard_bottom - billboard_top
+    line_height = min(font_size * 1.2 + app.LINE_SPACING_EXTRA, available_height / max(line_count, 1))
+    total_height = line_count * line_height
+    start_y = billboard_top
+    if total_height < available_height:
+        start_y = billboard_top + (available_height - total_height) / 2
+    start_y -= app.START_Y_OFFSET
+    left_margin = (width * 0.28) + 100
+    return [(left_margin, start_y + (i * line_height)) for i in range(line_count)]
+
+
+@pytest.mark.parametrize('size', [SIZE, (800, 523)])
+@pytest.mark.parametrize('font_size', [20, 80, 200, 360])
+@pytest.mark.parametrize('line_count', [0, 1, 3, 8, 20])
+def test_plan_matches_scalar_formula(size, font_size, line_count):
+    plan = app.LayoutPlan(size, font_size, line_count)
+    expected = scalar_positions(size, font_size, line_count)
+    assert len(plan.positions) == line_count
+    assert np.allclose(np.array(plan.positions).reshape(-1, 2), np.array(expected).reshape(-1, 2))
+
+
+def test_compute_layouts_matches_plans():
+    font_sizes = [40, 80, 120, 360]
+    line_counts = [1, 4, 2, 6]
+    left_margin, start_y, line_height = app.compute_layouts(SIZE, font_sizes, line_counts)
+    for k, (font_size, line_count) in enumerate(zip(font_sizes, line_counts)):
+        plan = app.LayoutPlan(SIZE, font_size, line_count)
+        assert left_margin == pytest.approx(plan.left_margin)
+        assert start_y[k] == pytest.approx(plan.start_y)
+        assert line_height[k] == pytest.approx(plan.line_height)
+
+
+def test_layout_batch_matches_per_message_plans():
+    messages = ['go ducks', '', 'happy birthday\n\ndad', '\n', 'x' * 60,
+                'welcome to oregon make this sign say anything']
+    font_sizes = [80, 120, 60, 40, 200, 360]
+    draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+    batch = app.layout_batch(messages, font_sizes, SIZE)
+    assert len(batch) == len(messages)
+    for message, font_size, (lines, positions) in zip(messages, font_sizes, batch):
+        expected_lines = app.wrap_text(message.upper(), app.get_font(font_size), int(SIZE[0] * 0.7), draw)
+        assert lines == expected_lines
+        plan = app.get_layout_plan(SIZE, font_size, len(lines))
+        assert positions.shape == (len(lines), 2)
+        assert np.allclose(positions, np.array(plan.positions).reshape(-1, 2))
+
+
+def test_layout_batch_single_font_size_and_empty_input():
+    batch = app.layout_batch(['a', 'b\nc'], 100, SIZE)
+    assert [len(lines) for lines, _ in batch] == [1, 2]
+    assert np.allclose(batch[1][1], app.get_layout_plan(SIZE, 100, 2).positions)
+    assert app.layout_batch([], 100, SIZE) == []
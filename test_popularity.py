@@ -0,0 +1,105 @@
+"""
+Tests for popularity: candidate eviction and merging counts from several
+processes that share one file.
+
+Run with:
+    python -m pytest -q
+"""
+
+import pytest
+
+import popularity
+from popularity import PopularRequests
+
+
+def record(tracker, key, times):
+    for _ in range(times):
+        tracker.record(key, {'message': key})
+
+
+def counts(tracker):
+    return {payload['message']: count for count, payload in tracker.top(100)}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'popular.json')
+
+
+def shared(path, **kwargs):
+    tracker = PopularRequests(path, **kwargs)
+    tracker.load()
+    return tracker
+
+
+def test_keeps_the_most_frequent_candidates():
+    tracker = PopularRequests(max_candidates=3)
+    for key, times in [('a', 5), ('b', 1), ('c', 3), ('d', 4), ('e', 2), ('b', 6)]:
+        record(tracker, key, times)
+    assert counts(tracker) == {'b': 7, 'a': 5, 'd': 4}
+    assert len(tracker._heap) == 3
+
+
+def test_two_workers_merge_without_double_counting(path):
+    first, second = shared(path), shared(path)
+    record(first, 'x', 30)
+    record(second, 'x', 20)
+    record(second, 'y', 5)
+    first.save()
+    second.save()
+    assert counts(second) == {'x': 50, 'y': 5}
+
+    # Saving again adds only what was recorded since the last save
+    record(first, 'x', 10)
+    first.save()
+    second.save()
+    assert counts(first) == {'x': 60, 'y': 5}
+    assert counts(shared(path)) == {'x': 60, 'y': 5}
+    assert shared(path).recorded == 65
+
+
+def test_save_without_new_records_picks_up_other_workers(path):
+    worker, warmup = shared(path), shared(path)
+    record(worker, 'x', 3)
+    worker.save()
+    assert counts(warmup) == {}
+    warmup.save()
+    assert counts(warmup) == {'x': 3}
+
+
+def test_restart_does_not_double_count(path):
+    tracker = shared(path)
+    record(tracker, 'x', 4)
+    tracker.save()
+    restarted = shared(path)
+    record(restarted, 'x', 1)
+    restarted.save()
+    assert counts(shared(path)) == {'x': 5}
+
+
+def test_halving_applies_once_to_each_count(path, monkeypatch):
+    monkeypatch.setattr(popularity, 'DECAY_AFTER', 100)
+    first = shared(path)
+    record(first, 'x', 80)
+    first.save()
+
+    # The 100th record here halves the local counts, including x from the file
+    second = shared(path)
+    record(second, 'y', 100)
+    assert counts(second) == {'x': 40, 'y': 50}
+    second.save()
+    assert counts(shared(path)) == {'x': 40, 'y': 50}
+
+
+def test_merge_evicts_the_weakest_candidates(path):
+    first = shared(path, max_candidates=2)
+    second = shared(path, max_candidates=2)
+    record(first, 'a', 5)
+    record(first, 'b', 4)
+    record(second, 'c', 10)
+    first.save()
+    second.save()
+    assert counts(second) == {'c': 10, 'a': 5}
+    first.save()
+    assert counts(first) == {'c': 10, 'a': 5}
+    assert counts(shared(path, max_candidates=2)) == {'c': 10, 'a': 5}